@@ -0,0 +1,52 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import add_vocabulary_args, train_rhymer  # noqa: E402
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(
+        description='Compares throughput of get_rhymes_batch with a loop of get_rhymes calls.')
+    add_vocabulary_args(parser, n_words=50000)
+    parser.add_argument('--batch-size', type=int, default=2000)
+    return parser.parse_args()
+
+
+def main(word_phonemes_file_path, n_words, batch_size, seed):
+    rhymer = train_rhymer(word_phonemes_file_path, n_words, seed)
+
+    # Job inputs repeat popular words, so queries are drawn from a Zipf-like
+    # distribution.
+    rng = random.Random(seed)
+    vocabulary_size = len(rhymer.words)
+    weights = [1 / (rank + 1) for rank in range(vocabulary_size)]
+    word_ids = rng.choices(range(vocabulary_size), weights=weights, k=batch_size)
+    words = [rhymer.words[word_id] for word_id in word_ids]
+
+    start = time.perf_counter()
+    for word in words:
+        rhymer.get_rhymes([word])
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    rhymer.get_rhymes_batch(words)
+    batch_time = time.perf_counter() - start
+
+    print(f'unique words: {len(set(word_ids))} of {batch_size}')
+    print(f'{"get_rhymes loop":<20} {loop_time:8.3f}s {batch_size / loop_time:10.1f} words/s')
+    print(f'{"get_rhymes_batch":<20} {batch_time:8.3f}s {batch_size / batch_time:10.1f} words/s')
+
+
+if __name__ == '__main__':
+    args = _parse_args()
+    main(
+        word_phonemes_file_path=args.word_phonemes_file_path,
+        n_words=args.n_words,
+        batch_size=args.batch_size,
+        seed=args.seed,
+    )
@@ -0,0 +1,112 @@
+import argparse
+import asyncio
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from aiohttp import web
+
+# The crawler imports `common` of the scripts directory.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
+
+import crawl_word_stresses  # noqa: E402
+from common import CheckpointedWriter, Requester  # noqa: E402
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(
+        description='Measures throughput and peak memory of crawl_word_stresses against a local mock server.')
+    parser.add_argument('--n-urls', type=int, default=5000)
+    parser.add_argument('--page-size', type=int, default=100000, help='Approximate size of a page in bytes.')
+    parser.add_argument('--latency', type=float, default=0.01, help='Mock server response delay in seconds.')
+    parser.add_argument('--n-workers', type=int, default=10)
+    parser.add_argument('--n-parse-workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--port', type=int, default=8642)
+    return parser.parse_args()
+
+
+def _serve(port, page_size, latency):
+    padding = '<p>' + 'x' * page_size + '</p>'
+
+    async def handle(request):
+        i = request.match_info['i']
+        await asyncio.sleep(latency)
+        text = (f'<html><body><h1 id="firstHeading">Слово{i}</h1>'
+                f'<p>корень: <b>-слов{i}-</b>;</p>'
+                f'<table class="morfotable ru"><tr><td bgcolor="#ffffff">сло́во{i}</td>'
+                f'<td bgcolor="#ffffff">сло́ва{i}</td></tr></table>{padding}</body></html>')
+        return web.Response(text=text, content_type='text/html')
+
+    app = web.Application()
+    app.add_routes([web.get('/wiki/{i}', handle)])
+    web.run_app(app, host='127.0.0.1', port=port, print=None)
+
+
+async def _run_gather_all(word_urls_file_path, out_file_path, n_workers, n_parse_workers):
+    # The previous scheduler: a coroutine per url, all gathered at once.
+    with open(word_urls_file_path) as inp_file:
+        word_urls = set(url.strip() for url in inp_file)
+    requester = Requester(concurrency=n_workers, limit_per_host=n_workers)
+    with CheckpointedWriter(out_file_path, f'{out_file_path}.done') as writer, \
+            ProcessPoolExecutor(max_workers=n_parse_workers) as executor:
+        async with requester:
+
+            async def crawl_word(url):
+                writer.write(url, await crawl_word_stresses._get_word_payloads(requester, executor, url))
+
+            await asyncio.gather(*[crawl_word(url) for url in word_urls])
+
+
+def _crawl(name, word_urls_file_path, out_file_path, n_workers, n_parse_workers, results):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    start = time.perf_counter()
+    if name == 'queue':
+        cor = crawl_word_stresses._run(
+            word_urls_file_path, out_file_path, None, n_workers, n_parse_workers, restart=True)
+    else:
+        cor = _run_gather_all(word_urls_file_path, out_file_path, n_workers, n_parse_workers)
+    loop.run_until_complete(cor)
+    results.put((time.perf_counter() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss))
+
+
+def main(n_urls, page_size, latency, n_workers, n_parse_workers, port):
+    crawl_word_stresses._logger.disabled = True
+    server = multiprocessing.Process(target=_serve, args=(port, page_size, latency), daemon=True)
+    server.start()
+    time.sleep(1)
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            word_urls_file_path = os.path.join(tmp_dir, 'urls.txt')
+            with open(word_urls_file_path, 'w') as out_file:
+                for i in range(n_urls):
+                    out_file.write(f'http://127.0.0.1:{port}/wiki/{i}\n')
+
+            for name in ('gather', 'queue'):
+                out_file_path = os.path.join(tmp_dir, f'{name}.jsonl')
+                results = multiprocessing.Queue()
+                process = multiprocessing.Process(
+                    target=_crawl,
+                    args=(name, word_urls_file_path, out_file_path, n_workers, n_parse_workers, results))
+                process.start()
+                elapsed, max_rss_kb = results.get()
+                process.join()
+                print(f'{name:<8} {elapsed:8.3f}s {n_urls / elapsed:10.1f} pages/s peak rss={max_rss_kb / 1024:8.1f}MB')
+    finally:
+        server.terminate()
+
+
+if __name__ == '__main__':
+    args = _parse_args()
+    main(
+        n_urls=args.n_urls,
+        page_size=args.page_size,
+        latency=args.latency,
+        n_workers=args.n_workers,
+        n_parse_workers=args.n_parse_workers,
+        port=args.port,
+    )
@@ -0,0 +1,105 @@
+import argparse
+import multiprocessing
+import os
+import re
+import resource
+import sys
+import tempfile
+import time
+from itertools import islice
+
+import numpy as np
+import orjson
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import add_vocabulary_args, word_phonemes_file  # noqa: E402
+from tom_rhymer.model_file import read_model_file  # noqa: E402
+from tom_rhymer.rhymer import Rhymer, Word  # noqa: E402
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(
+        description='Compares training time and peak memory of the block ingestion and the per-record one.')
+    add_vocabulary_args(parser, n_words=200000)
+    return parser.parse_args()
+
+
+def _parse_lines_per_record(lines, allowed_words):
+    # The previous parser: a JSON document, a regex and a `Word` per line.
+    words, phonemes = [], []
+    for line in lines:
+        data = orjson.loads(line)
+        base_word = re.sub(r'\++', '', data['word'])
+        if allowed_words and base_word not in allowed_words:
+            continue
+        words.append(Word(word=data['word'], roots=set(data['roots'])))
+        phonemes.append(data['phonemes'])
+    return words, phonemes
+
+
+def _train_per_record(rhymer, word_phonemes_file_path, chunk_size=10000):
+    # The previous training loop: records of line chunks, then the words are
+    # POS tagged and added one by one, with a single rebuild of the trees.
+    words, phonemes = [], []
+    with open(word_phonemes_file_path, 'rb') as inp_file:
+        for chunk in iter(lambda: list(islice(inp_file, chunk_size)), []):
+            chunk_words, chunk_phonemes = _parse_lines_per_record(chunk, None)
+            words.extend(chunk_words)
+            phonemes.extend(chunk_phonemes)
+    rhymer.add_words(words, phonemes)
+
+
+def _train(name, word_phonemes_file_path, model_file_path, results):
+    rhymer = Rhymer()
+    # Tree building is the same for both paths, and is reported apart.
+    rhymer.enable_profiling()
+    start = time.perf_counter()
+    if name == 'blocks':
+        rhymer.train(word_phonemes_file_path, allowed_words=None)
+    else:
+        _train_per_record(rhymer, word_phonemes_file_path)
+    elapsed = time.perf_counter() - start
+    build_time = rhymer.profile_info().stage_times['trees']
+    rhymer.save(model_file_path)
+    results.put((elapsed, build_time, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, len(rhymer.words)))
+
+
+def _load_arrays(model_file_path):
+    arrays, _ = read_model_file(model_file_path)
+    return {name: np.array(array) for name, array in arrays.items()}
+
+
+def main(word_phonemes_file_path, n_words, seed):
+    with tempfile.TemporaryDirectory() as tmp_dir, word_phonemes_file(
+            word_phonemes_file_path, n_words, seed) as word_phonemes_file_path:
+
+        model_arrays = {}
+        for name in ('records', 'blocks'):
+            # Every path is trained in a fresh process, so its peak RSS is its own.
+            model_file_path = os.path.join(tmp_dir, f'{name}.bin')
+            results = multiprocessing.Queue()
+            process = multiprocessing.Process(
+                target=_train, args=(name, word_phonemes_file_path, model_file_path, results))
+            process.start()
+            elapsed, build_time, max_rss_kb, n_trained = results.get()
+            process.join()
+            model_arrays[name] = _load_arrays(model_file_path)
+            ingest_time = elapsed - build_time
+            print(f'{name:<8} train={elapsed:8.3f}s ingest={ingest_time:8.3f}s '
+                  f'{n_trained / ingest_time:10.1f} words/s trees={build_time:8.3f}s '
+                  f'peak rss={max_rss_kb / 1024:8.1f}MB')
+
+    records_arrays, blocks_arrays = model_arrays['records'], model_arrays['blocks']
+    same = records_arrays.keys() == blocks_arrays.keys() and all(
+        np.array_equal(records_arrays[name], blocks_arrays[name]) for name in records_arrays)
+    print(f'same model: {same}')
+
+
+if __name__ == '__main__':
+    args = _parse_args()
+    main(
+        word_phonemes_file_path=args.word_phonemes_file_path,
+        n_words=args.n_words,
+        seed=args.seed,
+    )
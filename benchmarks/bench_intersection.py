@@ -0,0 +1,46 @@
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import add_vocabulary_args, format_summary, measure, summarize, train_rhymer  # noqa: E402
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(
+        description='Compares the left/right set intersection with the single-pass candidate search '
+        'on the worst-case (shortest) signatures.')
+    add_vocabulary_args(parser, n_words=100000)
+    parser.add_argument('--n-queries', type=int, default=50)
+    return parser.parse_args()
+
+
+def main(word_phonemes_file_path, n_words, n_queries, seed):
+    rhymer = train_rhymer(word_phonemes_file_path, n_words, seed)
+
+    # The shortest signatures match the largest parts of both trees.
+    signatures = [rhymer._get_signatures(rhymer.words[word_id]) for word_id in range(len(rhymer.words))]
+    signatures = sorted(set(signatures), key=lambda s: (min(len(s[0]), len(s[1])), len(s[0]) + len(s[1])))
+    signatures = signatures[:n_queries]
+
+    def set_intersection(signature, min_n_matches, max_n_skips):
+        left_rhymes = rhymer._left_tree.iterate_on_nodes(signature[0], min_n_matches[0], max_n_skips[0])
+        right_rhymes = rhymer._right_tree.iterate_on_nodes(signature[1], min_n_matches[1], max_n_skips[1])
+        return set(left_rhymes) & set(right_rhymes)
+
+    for min_n_matches, max_n_skips in [((2, 2), (0, 0)), ((3, 3), (0, 0)), ((4, 4), (1, 0))]:
+        for name, fn in [('set intersection', set_intersection), ('single pass', rhymer._get_rhyme_ids)]:
+            queries = iter(signatures)
+            latencies = measure(lambda: fn(next(queries), min_n_matches, max_n_skips), len(signatures))
+            print(format_summary(f'{name} {min_n_matches} {max_n_skips}', summarize(latencies)))
+
+
+if __name__ == '__main__':
+    args = _parse_args()
+    main(
+        word_phonemes_file_path=args.word_phonemes_file_path,
+        n_words=args.n_words,
+        n_queries=args.n_queries,
+        seed=args.seed,
+    )
@@ -0,0 +1,52 @@
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import add_vocabulary_args, format_summary, measure, summarize, train_rhymer  # noqa: E402
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(
+        description='Compares latency of get_rhymes with iter_rhymes limited to a few rhymes.')
+    add_vocabulary_args(parser, n_words=50000)
+    parser.add_argument('--n-queries', type=int, default=500)
+    parser.add_argument('--limit', type=int, default=5, help='Number of rhymes taken from iter_rhymes.')
+    parser.add_argument('--scheme', type=str, default='ABAB')
+    return parser.parse_args()
+
+
+def main(word_phonemes_file_path, n_words, n_queries, limit, scheme, seed):
+    rhymer = train_rhymer(word_phonemes_file_path, n_words, seed)
+
+    rng = random.Random(seed)
+    words = [rhymer.words[rng.randrange(len(rhymer.words))] for _ in range(n_queries)]
+    queries = iter(words * 2)
+
+    print(format_summary('get_rhymes', summarize(measure(lambda: rhymer.get_rhymes([next(queries)]), n_queries))))
+    print(format_summary(
+        f'iter_rhymes(limit={limit})',
+        summarize(measure(lambda: list(rhymer.iter_rhymes([next(queries)], limit=limit)), n_queries))))
+
+    def get_rhymes_by_scheme():
+        try:
+            rhymer.get_rhymes_by_scheme(list(scheme))
+        except ValueError:
+            pass
+
+    random.seed(seed)
+    print(format_summary(f'get_rhymes_by_scheme({scheme})', summarize(measure(get_rhymes_by_scheme, n_queries))))
+
+
+if __name__ == '__main__':
+    args = _parse_args()
+    main(
+        word_phonemes_file_path=args.word_phonemes_file_path,
+        n_words=args.n_words,
+        n_queries=args.n_queries,
+        limit=args.limit,
+        scheme=args.scheme,
+        seed=args.seed,
+    )
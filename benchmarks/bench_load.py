@@ -0,0 +1,87 @@
+import argparse
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+
+import orjson
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import add_vocabulary_args, word_phonemes_file  # noqa: E402
+from tom_rhymer.rhymer import Rhymer, Word, _get_phonemes_signatures  # noqa: E402
+from tom_rhymer.tree import Tree  # noqa: E402
+
+_LOAD_CODE = '''
+import resource, sys, time
+from tom_rhymer.rhymer import Rhymer
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.perf_counter()
+rhymer = Rhymer.load(sys.argv[1])
+load_time = time.perf_counter() - start
+rhymer.get_rhymes([rhymer.words[0]])
+print(load_time, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss)
+'''
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description='Compares Rhymer.load startup time of the model formats.')
+    add_vocabulary_args(parser, n_words=200000)
+    parser.add_argument('--n-runs', type=int, default=5)
+    return parser.parse_args()
+
+
+def main(word_phonemes_file_path, n_words, n_runs, seed):
+    with tempfile.TemporaryDirectory() as tmp_dir, word_phonemes_file(
+            word_phonemes_file_path, n_words, seed) as word_phonemes_file_path:
+        rhymer = Rhymer()
+        rhymer.train(word_phonemes_file_path, allowed_words=None)
+
+        model_file_paths = {
+            'legacy pickle': os.path.join(tmp_dir, 'legacy.pkl'),
+            'pickle': os.path.join(tmp_dir, 'rhymer.pkl'),
+            'model file (mmap)': os.path.join(tmp_dir, 'rhymer.bin'),
+        }
+        _save_legacy_pickle(word_phonemes_file_path, model_file_paths['legacy pickle'])
+        with open(model_file_paths['pickle'], 'wb') as out_file:
+            pickle.dump(rhymer, out_file)
+        rhymer.save(model_file_paths['model file (mmap)'])
+
+        for name, file_path in model_file_paths.items():
+            load_times, rss_deltas = [], []
+            for _ in range(n_runs):
+                output = subprocess.check_output([sys.executable, '-c', _LOAD_CODE, file_path], env=os.environ)
+                load_time, rss_delta = output.split()
+                load_times.append(float(load_time))
+                rss_deltas.append(int(rss_delta))
+            print(f'{name:<20} size={os.path.getsize(file_path) / 2**20:8.2f}MiB '
+                  f'load={1000 * min(load_times):9.2f}ms rss=+{max(rss_deltas) / 2**10:8.2f}MiB')
+
+
+def _save_legacy_pickle(word_phonemes_file_path, out_file_path):
+    # Object graph of the models pickled before FrozenTree: Tree nodes which
+    # keep Word objects.
+    rhymer = Rhymer.__new__(Rhymer)
+    left_tree, right_tree, words = Tree(), Tree(), []
+    with open(word_phonemes_file_path) as inp_file:
+        for line in inp_file:
+            data = orjson.loads(line)
+            word = Word(word=data['word'], roots=set(data['roots']))
+            left_phonemes, right_phonemes = _get_phonemes_signatures(data['phonemes'])
+            left_tree.add(left_phonemes, word)
+            right_tree.add(right_phonemes, word)
+            words.append(word)
+    rhymer.__dict__.update(_left_tree=left_tree, _right_tree=right_tree, _words=words)
+    with open(out_file_path, 'wb') as out_file:
+        pickle.dump(rhymer, out_file)
+
+
+if __name__ == '__main__':
+    args = _parse_args()
+    main(
+        word_phonemes_file_path=args.word_phonemes_file_path,
+        n_words=args.n_words,
+        n_runs=args.n_runs,
+        seed=args.seed,
+    )
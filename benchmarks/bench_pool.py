@@ -0,0 +1,50 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import add_vocabulary_args, train_rhymer  # noqa: E402
+from tom_rhymer.pool import RhymerPool  # noqa: E402
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description='Measures RhymerPool throughput for different numbers of workers.')
+    add_vocabulary_args(parser, n_words=50000)
+    parser.add_argument('--n-queries', type=int, default=2000)
+    parser.add_argument('--n-workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    return parser.parse_args()
+
+
+def main(word_phonemes_file_path, n_words, n_queries, n_workers, seed):
+    rhymer = train_rhymer(word_phonemes_file_path, n_words, seed)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        model_file_path = os.path.join(tmp_dir, 'rhymer.bin')
+        rhymer.save(model_file_path)
+
+        rng = random.Random(seed)
+        queries = [[rng.choice(rhymer.words)] for _ in range(n_queries)]
+
+        for pool_n_workers in n_workers:
+            with RhymerPool(model_file_path, n_workers=pool_n_workers) as pool:
+                # Warm up: start the workers.
+                list(pool.map_get_rhymes(queries[:pool_n_workers]))
+                start = time.perf_counter()
+                for _ in pool.map_get_rhymes(queries):
+                    pass
+                elapsed = time.perf_counter() - start
+            print(f'workers={pool_n_workers:<3} {n_queries / elapsed:10.1f} queries/s')
+
+
+if __name__ == '__main__':
+    args = _parse_args()
+    main(
+        word_phonemes_file_path=args.word_phonemes_file_path,
+        n_words=args.n_words,
+        n_queries=args.n_queries,
+        n_workers=args.n_workers,
+        seed=args.seed,
+    )
@@ -0,0 +1,84 @@
+import argparse
+import copy
+import os
+import pickle
+import random
+import sys
+import time
+from functools import partial
+from itertools import cycle
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import add_vocabulary_args, format_summary, summarize, train_rhymer  # noqa: E402
+
+_SCHEMES = ['AB', 'ABAB', 'AABB', 'ABBA', 'ABABCC', 'AAAABBBB', 'ABABCDCD', 'AAAAAA']
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(
+        description='Compares latency distributions of the backtracking scheme search and random restarts, '
+                    'with seeds sampled uniformly and from the seed index.')
+    add_vocabulary_args(parser, n_words=50000)
+    parser.add_argument('--n-runs', type=int, default=100, help='Number of runs per scheme.')
+    return parser.parse_args()
+
+
+def _get_rhymes_by_scheme_with_restarts(rhymer, scheme, n_attempts=20):
+    # The previous generator: greedy attempts from scratch, cycling params levels.
+    levels = cycle(rhymer._DEFAULT_PARAMS)
+    for _, (min_n_matches, max_n_skips) in zip(range(n_attempts), levels):
+        rhymes = rhymer.try_get_rhymes_by_scheme(scheme, min_n_matches, max_n_skips)
+        if rhymes is not None:
+            return rhymes
+    raise ValueError("Can't find enough rhymes. Try to increase n_attempts")
+
+
+def _measure(rhymer, fn, scheme, n_runs):
+    # Every sampled seed is an attempt to fill a letter, and a profiled stage.
+    rhymer.enable_profiling()
+    latencies = []
+    n_failures = 0
+    for _ in range(n_runs):
+        start = time.perf_counter()
+        try:
+            fn(list(scheme))
+        except ValueError:
+            n_failures += 1
+        latencies.append(time.perf_counter() - start)
+    n_seeds = rhymer.profile_info().stage_counts.get('seed', 0)
+    rhymer.disable_profiling()
+    return latencies, n_failures, n_seeds / n_runs / len(set(scheme))
+
+
+def main(word_phonemes_file_path, n_words, n_runs, seed):
+    rhymer = train_rhymer(word_phonemes_file_path, n_words, seed)
+
+    indexed_rhymer = copy.deepcopy(rhymer)
+    start = time.perf_counter()
+    indexed_rhymer.build_seed_index()
+    build_time = time.perf_counter() - start
+    index_size = len(pickle.dumps(indexed_rhymer)) - len(pickle.dumps(rhymer))
+    print(f'seed index: {build_time:.3f}s, {index_size / 2**20:.1f}MB')
+
+    for scheme in _SCHEMES:
+        for name in ('restarts', 'backtracking'):
+            for sampling, sampling_rhymer in (('uniform', rhymer), ('index', indexed_rhymer)):
+                if name == 'restarts':
+                    fn = partial(_get_rhymes_by_scheme_with_restarts, sampling_rhymer)
+                else:
+                    fn = sampling_rhymer.get_rhymes_by_scheme
+                random.seed(seed)
+                latencies, n_failures, n_seeds = _measure(sampling_rhymer, fn, scheme, n_runs)
+                print(f'{format_summary(f"{scheme} {name} {sampling}", summarize(latencies))} '
+                      f'failures={n_failures} seeds/letter={n_seeds:.2f}')
+
+
+if __name__ == '__main__':
+    args = _parse_args()
+    main(
+        word_phonemes_file_path=args.word_phonemes_file_path,
+        n_words=args.n_words,
+        n_runs=args.n_runs,
+        seed=args.seed,
+    )
@@ -0,0 +1,44 @@
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import add_vocabulary_args, format_summary, measure, summarize, train_rhymer  # noqa: E402
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(
+        description='Compares get_rhymes latency with stored phoneme signatures and with G2P on every query.')
+    add_vocabulary_args(parser, n_words=20000)
+    parser.add_argument('--n-queries', type=int, default=200)
+    return parser.parse_args()
+
+
+def main(word_phonemes_file_path, n_words, n_queries, seed):
+    rhymer = train_rhymer(word_phonemes_file_path, n_words, seed)
+
+    rng = random.Random(seed)
+    queries = [rng.choice(rhymer.words) for _ in range(n_queries)]
+    query_iter = iter(queries * 2)
+
+    stored = measure(lambda: rhymer.get_rhymes([next(query_iter)]), n_queries)
+
+    # Words missing from the vocabulary go through G2P, so the same queries
+    # are repeated after they are removed to get the previous path.
+    rhymer.remove_words({word.word for word in queries})
+    g2p = measure(lambda: rhymer.get_rhymes([next(query_iter)]), n_queries)
+
+    print(format_summary('get_rhymes (g2p)', summarize(g2p)))
+    print(format_summary('get_rhymes (stored signatures)', summarize(stored)))
+
+
+if __name__ == '__main__':
+    args = _parse_args()
+    main(
+        word_phonemes_file_path=args.word_phonemes_file_path,
+        n_words=args.n_words,
+        n_queries=args.n_queries,
+        seed=args.seed,
+    )
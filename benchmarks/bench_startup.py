@@ -0,0 +1,75 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+import orjson
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import train_rhymer  # noqa: E402
+
+_STARTUP_CODE = '''
+import sys, time
+import orjson
+start = time.perf_counter()
+from tom_rhymer.rhymer import Rhymer, Word
+import_time = time.perf_counter() - start
+
+start = time.perf_counter()
+rhymer = Rhymer.load(sys.argv[1])
+load_time = time.perf_counter() - start
+
+start = time.perf_counter()
+rhymer.get_rhymes([rhymer.words[0]])
+in_vocabulary_time = time.perf_counter() - start
+
+start = time.perf_counter()
+rhymer.get_rhymes([Word(word=sys.argv[2], roots=set())])
+out_of_vocabulary_time = time.perf_counter() - start
+
+print(orjson.dumps({
+    'import': import_time,
+    'load': load_time,
+    'first in-vocabulary query': in_vocabulary_time,
+    'first out-of-vocabulary query': out_of_vocabulary_time,
+}).decode())
+'''
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(
+        description='Measures tom_rhymer.rhymer import time and the first queries latency in a fresh process.')
+    parser.add_argument('--rhymer-file-path', '-r', type=str, required=False, help='Path to the Rhymer model file.')
+    parser.add_argument('--n-words', type=int, default=20000, help='Size of the synthetic vocabulary.')
+    parser.add_argument('--oov-word', type=str, default='абракада+бра', help='Stressed out-of-vocabulary word.')
+    parser.add_argument('--n-runs', type=int, default=5)
+    return parser.parse_args()
+
+
+def main(rhymer_file_path, n_words, oov_word, n_runs):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if not rhymer_file_path:
+            rhymer_file_path = os.path.join(tmp_dir, 'rhymer.bin')
+            train_rhymer(None, n_words, seed=0).save(rhymer_file_path)
+
+        runs = []
+        for _ in range(n_runs):
+            output = subprocess.check_output(
+                [sys.executable, '-c', _STARTUP_CODE, rhymer_file_path, oov_word], env=os.environ)
+            runs.append(orjson.loads(output))
+
+    for name in runs[0]:
+        times = sorted(run[name] for run in runs)
+        print(f'{name:<32} median={1000 * times[len(times) // 2]:9.2f}ms max={1000 * times[-1]:9.2f}ms')
+
+
+if __name__ == '__main__':
+    args = _parse_args()
+    main(
+        rhymer_file_path=args.rhymer_file_path,
+        n_words=args.n_words,
+        oov_word=args.oov_word,
+        n_runs=args.n_runs,
+    )
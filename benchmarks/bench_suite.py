@@ -0,0 +1,171 @@
+import argparse
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import orjson
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import format_summary, make_synthetic_phonemes_file, summarize  # noqa: E402
+from tom_rhymer.rhymer import Rhymer  # noqa: E402
+
+_SCHEMES = ['ABAB', 'AABB', 'ABBA']
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(
+        description='Measures training, load, query latency, throughput and peak memory at several vocabulary sizes.')
+    parser.add_argument(
+        '--word-phonemes-file-path',
+        '-p',
+        type=str,
+        required=False,
+        help='Path to the words phonemes file to sample vocabularies from. Synthetic ones are generated if not set.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 50000, 200000], help='Vocabulary sizes.')
+    parser.add_argument('--n-queries', type=int, default=2000, help='Number of get_rhymes queries per size.')
+    parser.add_argument('--n-scheme-runs', type=int, default=100, help='Number of runs per scheme.')
+    parser.add_argument(
+        '--profile', action='store_true', help='Report time spent in the stages of the queries, see Rhymer.enable_profiling.')
+    parser.add_argument('--out-file-path', '-o', type=str, required=False, help='Path to write the results as JSON.')
+    parser.add_argument('--seed', type=int, default=0)
+    return parser.parse_args()
+
+
+def _sample_phonemes_file(inp_file_path, out_file_path, n_words, seed):
+    # Reservoir sampling, the input file may not fit in memory.
+    rng = random.Random(seed)
+    lines = []
+    with open(inp_file_path, 'rb') as inp_file:
+        for i, line in enumerate(inp_file):
+            if len(lines) < n_words:
+                lines.append(line)
+            else:
+                j = rng.randrange(i + 1)
+                if j < n_words:
+                    lines[j] = line
+    with open(out_file_path, 'wb') as out_file:
+        out_file.writelines(lines)
+
+
+def _get_max_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _train(word_phonemes_file_path, model_file_path, results):
+    start = time.perf_counter()
+    rhymer = Rhymer()
+    rhymer.train(word_phonemes_file_path, allowed_words=None)
+    train_time = time.perf_counter() - start
+    rhymer.save(model_file_path)
+    results.put({'train_s': train_time, 'train_max_rss_mb': _get_max_rss_mb(), 'n_words': len(rhymer.words)})
+
+
+def _serve(model_file_path, n_queries, n_scheme_runs, profile, seed, results):
+    start = time.perf_counter()
+    rhymer = Rhymer.load(model_file_path)
+    load_time = time.perf_counter() - start
+
+    stage_times = defaultdict(float)
+
+    def add_profile(query_profile):
+        for stage, seconds in query_profile.stages.items():
+            stage_times[(query_profile.query, stage)] += seconds
+        stage_times[(query_profile.query, 'total')] += query_profile.total
+
+    if profile:
+        rhymer.enable_profiling(add_profile)
+
+    rng = random.Random(seed)
+    words = [rhymer.words[rng.randrange(len(rhymer.words))] for _ in range(n_queries)]
+    latencies = []
+    for word in words:
+        query_start = time.perf_counter()
+        rhymer.get_rhymes([word])
+        latencies.append(time.perf_counter() - query_start)
+    result = {
+        'load_s': load_time,
+        'get_rhymes': summarize(latencies),
+        'get_rhymes_qps': len(latencies) / sum(latencies),
+    }
+
+    random.seed(seed)
+    for scheme in _SCHEMES:
+        latencies = []
+        for _ in range(n_scheme_runs):
+            query_start = time.perf_counter()
+            try:
+                rhymer.get_rhymes_by_scheme(list(scheme))
+            except ValueError:
+                pass
+            latencies.append(time.perf_counter() - query_start)
+        result[f'scheme {scheme}'] = summarize(latencies)
+
+    result['serve_max_rss_mb'] = _get_max_rss_mb()
+    if profile:
+        info = rhymer.profile_info()
+        result['profile_ms'] = {
+            f'{query} {stage}': 1000 * seconds / info.n_queries[query]
+            for (query, stage), seconds in sorted(stage_times.items())
+        }
+    results.put(result)
+
+
+def _run_in_process(target, *args):
+    # Every stage runs in a fresh process, so its peak RSS is its own.
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(target=target, args=(*args, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def main(word_phonemes_file_path, sizes, n_queries, n_scheme_runs, profile, out_file_path, seed):
+    all_results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in sizes:
+            size_phonemes_file_path = os.path.join(tmp_dir, f'phonemes_{size}.jsonl')
+            if word_phonemes_file_path:
+                _sample_phonemes_file(word_phonemes_file_path, size_phonemes_file_path, size, seed)
+            else:
+                make_synthetic_phonemes_file(size_phonemes_file_path, size, seed=seed)
+            model_file_path = os.path.join(tmp_dir, f'rhymer_{size}.bin')
+
+            result = {'size': size}
+            result.update(_run_in_process(_train, size_phonemes_file_path, model_file_path))
+            result['model_mb'] = os.path.getsize(model_file_path) / 2**20
+            result.update(_run_in_process(_serve, model_file_path, n_queries, n_scheme_runs, profile, seed))
+            all_results.append(result)
+
+            print(f'--- {result["n_words"]} words')
+            print(f'train={result["train_s"]:.3f}s peak rss={result["train_max_rss_mb"]:.1f}MB '
+                  f'model={result["model_mb"]:.1f}MB')
+            print(f'load={1000 * result["load_s"]:.3f}ms serve peak rss={result["serve_max_rss_mb"]:.1f}MB')
+            print(f'{format_summary("get_rhymes", result["get_rhymes"])} {result["get_rhymes_qps"]:.1f} queries/s')
+            for scheme in _SCHEMES:
+                print(format_summary(f'get_rhymes_by_scheme {scheme}', result[f'scheme {scheme}']))
+            for name, ms in result.get('profile_ms', {}).items():
+                print(f'{name:<40} {ms:9.3f}ms/query')
+
+    if out_file_path:
+        with open(out_file_path, 'wb') as out_file:
+            out_file.write(orjson.dumps(all_results, option=orjson.OPT_INDENT_2))
+
+
+if __name__ == '__main__':
+    args = _parse_args()
+    main(
+        word_phonemes_file_path=args.word_phonemes_file_path,
+        sizes=args.sizes,
+        n_queries=args.n_queries,
+        n_scheme_runs=args.n_scheme_runs,
+        profile=args.profile,
+        out_file_path=args.out_file_path,
+        seed=args.seed,
+    )
@@ -0,0 +1,67 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import add_vocabulary_args, word_phonemes_file  # noqa: E402
+from tom_rhymer.rhymer import Rhymer  # noqa: E402
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(
+        description='Compares training time of the single process and the worker processes modes.')
+    add_vocabulary_args(parser, n_words=200000)
+    parser.add_argument('--n-workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--block-size', type=int, default=1 << 16, help='Size of the phonemes file blocks in bytes.')
+    return parser.parse_args()
+
+
+def _train(word_phonemes_file_path, n_workers, block_size):
+    rhymer = Rhymer()
+    start = time.perf_counter()
+    rhymer.train(word_phonemes_file_path, allowed_words=None, n_workers=n_workers, block_size=block_size)
+    return rhymer, time.perf_counter() - start
+
+
+def _to_arrays(rhymer, tmp_dir):
+    # Compares the models by their saved arrays.
+    from tom_rhymer.model_file import read_model_file
+
+    file_path = os.path.join(tmp_dir, 'rhymer.bin')
+    rhymer.save(file_path)
+    arrays, _ = read_model_file(file_path)
+    return {name: np.array(array) for name, array in arrays.items()}
+
+
+def main(word_phonemes_file_path, n_words, n_workers, block_size, seed):
+    with tempfile.TemporaryDirectory() as tmp_dir, word_phonemes_file(
+            word_phonemes_file_path, n_words, seed) as word_phonemes_file_path:
+
+        serial_rhymer, serial_time = _train(word_phonemes_file_path, 1, block_size)
+        parallel_rhymer, parallel_time = _train(word_phonemes_file_path, n_workers, block_size)
+
+        serial_arrays = _to_arrays(serial_rhymer, tmp_dir)
+        parallel_arrays = _to_arrays(parallel_rhymer, tmp_dir)
+
+    same = serial_arrays.keys() == parallel_arrays.keys() and all(
+        np.array_equal(serial_arrays[name], parallel_arrays[name]) for name in serial_arrays)
+    n_trained = len(serial_rhymer.words)
+    print(f'words: {n_trained}, same model: {same}')
+    print(f'{"n_workers=1":<16} {serial_time:8.3f}s {n_trained / serial_time:10.1f} words/s')
+    print(f'{f"n_workers={n_workers}":<16} {parallel_time:8.3f}s {n_trained / parallel_time:10.1f} words/s')
+
+
+if __name__ == '__main__':
+    args = _parse_args()
+    main(
+        word_phonemes_file_path=args.word_phonemes_file_path,
+        n_words=args.n_words,
+        n_workers=args.n_workers,
+        block_size=args.block_size,
+        seed=args.seed,
+    )
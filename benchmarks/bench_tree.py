@@ -0,0 +1,83 @@
+import argparse
+import os
+import pickle
+import random
+import sys
+import time
+import tracemalloc
+
+import orjson
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import (  # noqa: E402
+    add_vocabulary_args, encode_signatures, format_summary, iterate_on_nodes_reference, measure, summarize,
+    word_phonemes_file)
+from tom_rhymer.rhymer import Word, _get_phonemes_signatures  # noqa: E402
+from tom_rhymer.tree import FrozenTree, Tree, pad_paths  # noqa: E402
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(
+        description='Compares memory and query time of the dict-based Tree and the array-based FrozenTree.')
+    add_vocabulary_args(parser, n_words=50000)
+    parser.add_argument('--n-queries', type=int, default=200)
+    return parser.parse_args()
+
+
+def main(word_phonemes_file_path, n_words, n_queries, seed):
+    with word_phonemes_file(word_phonemes_file_path, n_words, seed) as file_path, open(file_path) as inp_file:
+        records = [orjson.loads(line) for line in inp_file]
+
+    signatures = [_get_phonemes_signatures(record['phonemes']) for record in records]
+    words = [Word(word=record['word'], roots=set(record['roots'])) for record in records]
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    trees = Tree(), Tree()
+    for word, word_signatures in zip(words, signatures):
+        for tree, signature in zip(trees, word_signatures):
+            tree.add(signature, word)
+    dict_build_time = time.perf_counter() - start
+    dict_memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    encoded = encode_signatures(signatures)
+    frozen_trees = tuple(
+        FrozenTree.from_paths(pad_paths([word_signatures[side] for word_signatures in encoded])) for side in (0, 1))
+    frozen_build_time = time.perf_counter() - start
+    frozen_memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    print(f'{"dict Tree":<16} build={dict_build_time:7.3f}s memory={dict_memory / 2**20:8.2f}MiB '
+          f'pickle={len(pickle.dumps(trees)) / 2**20:8.2f}MiB')
+    print(f'{"FrozenTree":<16} build={frozen_build_time:7.3f}s memory={frozen_memory / 2**20:8.2f}MiB '
+          f'pickle={len(pickle.dumps(frozen_trees)) / 2**20:8.2f}MiB')
+
+    rng = random.Random(seed)
+    query_ids = [rng.randrange(len(records)) for _ in range(n_queries)]
+    for side in (0, 1):
+        for min_n_matches, max_n_skips in [(4, 1), (3, 0), (2, 0)]:
+            dict_queries = iter(query_ids)
+            frozen_queries = iter(query_ids)
+            dict_latencies = measure(
+                lambda: set(iterate_on_nodes_reference(trees[side], signatures[next(dict_queries)][side],
+                                                       min_n_matches, max_n_skips)), n_queries)
+            frozen_latencies = measure(
+                lambda: set(frozen_trees[side].iterate_on_nodes(encoded[next(frozen_queries)][side],
+                                                                min_n_matches, max_n_skips)), n_queries)
+            name = f'{("left", "right")[side]} ({min_n_matches}, {max_n_skips})'
+            print(format_summary(f'dict Tree {name}', summarize(dict_latencies)))
+            print(format_summary(f'FrozenTree {name}', summarize(frozen_latencies)))
+
+
+if __name__ == '__main__':
+    args = _parse_args()
+    main(
+        word_phonemes_file_path=args.word_phonemes_file_path,
+        n_words=args.n_words,
+        n_queries=args.n_queries,
+        seed=args.seed,
+    )
@@ -0,0 +1,82 @@
+import argparse
+import os
+import random
+import sys
+
+import orjson
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import (  # noqa: E402
+    add_vocabulary_args, encode_signatures, format_summary, iterate_on_nodes_reference, measure, summarize,
+    word_phonemes_file)
+from tom_rhymer.rhymer import Rhymer, _get_phonemes_signatures  # noqa: E402
+from tom_rhymer.tree import FrozenTree, Tree, pad_paths  # noqa: E402
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(
+        description='Checks FrozenTree.iterate_on_nodes against the original recursive traversal of the '
+                    'dict-based Tree for every side of Rhymer._DEFAULT_PARAMS, and compares their latencies.')
+    add_vocabulary_args(parser, n_words=100000)
+    parser.add_argument('--n-queries', type=int, default=100)
+    return parser.parse_args()
+
+
+def main(word_phonemes_file_path, n_words, n_queries, seed):
+    with word_phonemes_file(word_phonemes_file_path, n_words, seed) as file_path, open(file_path) as inp_file:
+        signatures = [_get_phonemes_signatures(orjson.loads(line)['phonemes']) for line in inp_file]
+
+    # Both trees get the same integer tags, as `FrozenTree` requires.
+    signatures = encode_signatures(signatures)
+    trees = Tree(), Tree()
+    for word_id, word_signatures in enumerate(signatures):
+        for tree, signature in zip(trees, word_signatures):
+            tree.add(signature, word_id)
+    frozen_trees = [
+        FrozenTree.from_paths(pad_paths([word_signatures[side] for word_signatures in signatures]))
+        for side in (0, 1)
+    ]
+
+    rng = random.Random(seed)
+    queries = [rng.choice(signatures) for _ in range(n_queries)]
+    side_params = sorted({
+        (side, min_n_matches[side], max_n_skips[side])
+        for min_n_matches, max_n_skips in Rhymer._DEFAULT_PARAMS for side in (0, 1)
+    })
+    n_mismatches = 0
+    for side, min_n_matches, max_n_skips in side_params:
+        tree, frozen_tree = trees[side], frozen_trees[side]
+        name = f'{("left", "right")[side]} ({min_n_matches}, {max_n_skips})'
+
+        n_yielded, n_unique, n_side_mismatches = 0, 0, 0
+        for query in queries:
+            values = list(iterate_on_nodes_reference(tree, query[side], min_n_matches, max_n_skips))
+            n_yielded += len(values)
+            n_unique += len(set(values))
+            n_side_mismatches += set(values) != set(
+                frozen_tree.iterate_on_nodes(query[side], min_n_matches, max_n_skips))
+        n_mismatches += n_side_mismatches
+        print(f'{name}: recursive traversal yields {n_yielded} values, {n_unique} unique, '
+              f'{n_side_mismatches} queries differ from FrozenTree')
+
+        for implementation, fn in [
+            ('recursive', lambda query: set(iterate_on_nodes_reference(tree, query, min_n_matches, max_n_skips))),
+            ('FrozenTree', lambda query: list(frozen_tree.iterate_on_nodes(query, min_n_matches, max_n_skips))),
+        ]:
+            query_iter = iter(queries)
+            latencies = measure(lambda: fn(next(query_iter)[side]), n_queries)
+            print(format_summary(f'  {implementation}', summarize(latencies)))
+
+    if n_mismatches:
+        raise SystemExit(f'FrozenTree differs from the original traversal for {n_mismatches} queries')
+
+
+if __name__ == '__main__':
+    args = _parse_args()
+    main(
+        word_phonemes_file_path=args.word_phonemes_file_path,
+        n_words=args.n_words,
+        n_queries=args.n_queries,
+        seed=args.seed,
+    )
@@ -0,0 +1,179 @@
+import os
+import random
+import tempfile
+import time
+from contextlib import contextmanager
+from copy import deepcopy
+from typing import Callable, Dict, List, Sequence
+
+import orjson
+
+from tom_rhymer.rhymer import Rhymer
+
+_CONSONANTS = 'бвгдзклмнпрстфхцчшщж'
+_VOWELS = 'аоуыиеэяюё'
+_VOWEL_PHONEMES = {
+    'а': 'A', 'о': 'O', 'у': 'U', 'ы': 'Y', 'и': 'I',
+    'е': 'E', 'э': 'E', 'я': 'A', 'ю': 'U', 'ё': 'O',
+}
+
+
+def add_vocabulary_args(parser, n_words):
+    """Adds the options of the vocabulary a benchmark runs on."""
+    parser.add_argument(
+        '--word-phonemes-file-path',
+        '-p',
+        type=str,
+        required=False,
+        help='Path to the words phonemes file. A synthetic vocabulary is generated if not set.')
+    parser.add_argument('--n-words', type=int, default=n_words, help='Size of the synthetic vocabulary.')
+    parser.add_argument('--seed', type=int, default=0)
+
+
+@contextmanager
+def word_phonemes_file(word_phonemes_file_path, n_words, seed):
+    """Yields the phonemes file path, or the path of a synthetic file if it's not set."""
+    if word_phonemes_file_path:
+        yield word_phonemes_file_path
+        return
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        synthetic_file_path = os.path.join(tmp_dir, 'phonemes.jsonl')
+        make_synthetic_phonemes_file(synthetic_file_path, n_words, seed=seed)
+        yield synthetic_file_path
+
+
+def train_rhymer(word_phonemes_file_path, n_words, seed):
+    """Trains a Rhymer on the vocabulary of `add_vocabulary_args` options."""
+    with word_phonemes_file(word_phonemes_file_path, n_words, seed) as file_path:
+        rhymer = Rhymer()
+        rhymer.train(file_path, allowed_words=None)
+    return rhymer
+
+
+def make_synthetic_phonemes_file(out_file_path, n_words, seed=0):
+    """Writes a phonemes file in the scripts/phonemize_words.py format.
+
+    Words are random syllable chains with a single stressed vowel. Phonemes follow
+    the spelling, which keeps the trees shaped like the real ones without G2P.
+    """
+    rng = random.Random(seed)
+    roots = [_make_root(rng) for _ in range(max(1, n_words // 5))]
+    seen = set()
+    with open(out_file_path, 'wb') as out_file:
+        while len(seen) < n_words:
+            record = _make_record(rng, roots)
+            if record['word'] in seen:
+                continue
+            seen.add(record['word'])
+            out_file.write(orjson.dumps(record))
+            out_file.write(b'\n')
+
+
+def _make_root(rng):
+    return ''.join(rng.choice(_CONSONANTS) + rng.choice(_VOWELS) for _ in range(rng.randint(1, 2)))
+
+
+def _make_record(rng, roots):
+    n_syllables = rng.randint(1, 5)
+    syllables = [rng.choice(_CONSONANTS) + rng.choice(_VOWELS) for _ in range(n_syllables)]
+    if rng.random() < 0.5:
+        syllables[-1] += rng.choice(_CONSONANTS)
+    stress_syllable = rng.randrange(n_syllables)
+
+    word = ''
+    phonemes = []
+    stress_idx = None
+    for i_syllable, syllable in enumerate(syllables):
+        for char in syllable:
+            word += char
+            if char in _VOWEL_PHONEMES:
+                if i_syllable == stress_syllable:
+                    word += '+'
+                    # The index of the stressed phoneme, as in scripts/phonemize_words.py.
+                    stress_idx = len(phonemes)
+                    phonemes.append(_VOWEL_PHONEMES[char] + '0')
+                else:
+                    phonemes.append(_VOWEL_PHONEMES[char])
+            else:
+                phonemes.append(char)
+
+    word_roots = rng.sample(roots, rng.randint(1, 2))
+    return {'word': word, 'roots': word_roots, 'phonemes': phonemes, 'stress_idx': stress_idx}
+
+
+def encode_signatures(signatures):
+    """Replaces phonemes of the `(left, right)` signatures with integer tags."""
+    alphabet = {}
+    return [
+        tuple(tuple(alphabet.setdefault(phoneme, len(alphabet)) for phoneme in signature)
+              for signature in word_signatures)
+        for word_signatures in signatures
+    ]
+
+
+def measure(fn: Callable[[], object], n_runs) -> List[float]:
+    latencies = []
+    for _ in range(n_runs):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def summarize(latencies: Sequence[float]) -> Dict[str, float]:
+    latencies = sorted(latencies)
+    n = len(latencies)
+    return {
+        'n': n,
+        'mean_ms': 1000 * sum(latencies) / n,
+        'p50_ms': 1000 * latencies[int(0.50 * (n - 1))],
+        'p99_ms': 1000 * latencies[int(0.99 * (n - 1))],
+    }
+
+
+def format_summary(name, summary):
+    return (f'{name:<32} n={summary["n"]:<6} mean={summary["mean_ms"]:9.3f}ms '
+            f'p50={summary["p50_ms"]:9.3f}ms p99={summary["p99_ms"]:9.3f}ms')
+
+
+def iterate_on_nodes_reference(tree, path, min_n_matches, max_n_skips):
+    """Yields values of a dict `Tree` which match the path, by the original rules.
+
+    The traversal before the explicit-stack rewrite: recursive generators which
+    deep-copy their state on every call and may yield the same value several
+    times. `FrozenTree` results are checked against it.
+    """
+    min_n_matches = min(len(path), min_n_matches)
+    node = tree._roots.get(path[0])
+    if not node:
+        return
+    yield from _iterate_on_node(node, path[1:], _IterStats(min_n_matches - 1, max_n_skips))
+
+
+class _IterStats:
+    def __init__(self, n_matches_todo, n_skips_allowed):
+        self.n_matches_todo = n_matches_todo
+        self.n_skips_allowed = n_skips_allowed
+
+
+def _iterate_on_node(node, path, iter_stats):
+    iter_stats = deepcopy(iter_stats)
+
+    if iter_stats.n_matches_todo <= 0:
+        yield from node._values
+        for child in node._children.values():
+            yield from _iterate_on_node(child, path[1:], iter_stats)
+
+    if not path:
+        return
+
+    if iter_stats.n_skips_allowed > 0:
+        for tag, child in node._children.items():
+            if tag != path[0]:
+                iter_stats.n_skips_allowed -= 1
+                yield from _iterate_on_node(child, path[1:], iter_stats)
+
+    child = node._children.get(path[0])
+    if child:
+        iter_stats.n_matches_todo -= 1
+        yield from _iterate_on_node(child, path[1:], iter_stats)
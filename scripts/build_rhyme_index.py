@@ -0,0 +1,45 @@
+from argparse import ArgumentParser
+
+from tom_rhymer.rhymer import Rhymer
+
+
+def _parse_args():
+    parser = ArgumentParser(description='Precomputes rhymes of every vocabulary word and stores them in the model file.')
+    parser.add_argument(
+        '--rhymer-file-path',
+        '-r',
+        type=str,
+        required=True,
+        help='Path to the Rhymer model file, trained by scripts/train_rhymer.py script.')
+    parser.add_argument(
+        '--out-file-path',
+        '-o',
+        type=str,
+        required=True,
+        help='Output path to the Rhymer model file with the rhyme index.')
+    parser.add_argument('--n-workers', '-n', type=int, default=1, help='Number of worker processes.')
+    parser.add_argument(
+        '--seeds-only',
+        action='store_true',
+        help='Store only numbers of rhymes of the words, used to sample scheme seeds. '
+        'The full index stores them as well.')
+    return parser.parse_args()
+
+
+def main(rhymer_file_path, out_file_path, n_workers, seeds_only):
+    rhymer = Rhymer.load(rhymer_file_path)
+    if seeds_only:
+        rhymer.build_seed_index(n_workers=n_workers)
+    else:
+        rhymer.build_neighbor_index(n_workers=n_workers)
+    rhymer.save(out_file_path)
+
+
+if __name__ == '__main__':
+    args = _parse_args()
+    main(
+        rhymer_file_path=args.rhymer_file_path,
+        out_file_path=args.out_file_path,
+        n_workers=args.n_workers,
+        seeds_only=args.seeds_only,
+    )
@@ -1,44 +1,161 @@
 import asyncio
 import logging
-from typing import Optional
+import os
+import time
+from typing import Iterable, List, Optional, Set
 
 import aiohttp
 from aiohttp.client_exceptions import ClientConnectionError
 
 _logger = logging.getLogger(__name__)
 
+# Statuses of overloaded or failing servers, the request is retried.
+_RETRY_STATUSES = {429, 500, 502, 503, 504}
+
 
 class RequesterError(Exception):
     pass
 
 
+class _RetryableStatusError(Exception):
+    pass
+
+
 class Requester:
-    def __init__(self, concurrency, timeout=5, n_retries=5, wait_before_retry=5):
+    """Requests pages through one pooled session.
+
+    Connections are kept alive and reused, at most `concurrency` of them in
+    total and `limit_per_host` per host. Requests are started at most
+    `rate_limit` times per second if it's set. Failed requests are retried
+    after `wait_before_retry * 2 ** i_retry` seconds. Must be closed, or used
+    as an async context manager.
+    """
+
+    def __init__(
+            self,
+            concurrency,
+            timeout=5,
+            n_retries=5,
+            wait_before_retry=5,
+            limit_per_host=0,
+            rate_limit=None,
+            headers=None,
+    ):
+        self._concurrency = concurrency
         self._timeout = timeout
         self._n_retries = n_retries
         self._wait_before_retry = wait_before_retry
+        self._limit_per_host = limit_per_host
+        self._headers = headers
         self._semaphore = asyncio.BoundedSemaphore(concurrency)
+        self._rate_limiter = _RateLimiter(rate_limit) if rate_limit else None
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
 
     async def get(self, url, headers=None) -> Optional[str]:
         """Requests a page and returns content."""
 
         _logger.debug(f'Requesting page: {url}')
-        async with self._get_session(headers=headers) as session:
-            for i_retry in range(self._n_retries):
-                try:
-                    async with self._semaphore, session.get(url, allow_redirects=False) as response:
+        session = self._get_session()
+        for i_retry in range(self._n_retries):
+            try:
+                async with self._semaphore:
+                    if self._rate_limiter is not None:
+                        await self._rate_limiter.wait()
+                    async with session.get(url, headers=headers, allow_redirects=False) as response:
+                        if response.status in _RETRY_STATUSES:
+                            raise _RetryableStatusError(response.status)
                         text = await response.text()
                         _logger.debug(f'Page source obtained: {url}')
                         return text
-                except (asyncio.TimeoutError, ClientConnectionError):
-                    _logger.warning(f'Retrying [{i_retry + 1}/{self._n_retries}]: {url}')
-                    await asyncio.sleep(self._wait_before_retry)
-            else:
-                _logger.warning(f'Max number of retries exceeded for page: {url}')
-                raise RequesterError
-
-    def _get_session(self, headers):
-        connector = aiohttp.TCPConnector()
-        timeout = aiohttp.ClientTimeout(total=self._timeout)
-        session = aiohttp.ClientSession(connector=connector, timeout=timeout, headers=headers)
-        return session
+            except (asyncio.TimeoutError, ClientConnectionError, _RetryableStatusError):
+                wait = self._wait_before_retry * 2**i_retry
+                _logger.warning(f'Retrying [{i_retry + 1}/{self._n_retries}] in {wait}s: {url}')
+                await asyncio.sleep(wait)
+        else:
+            _logger.warning(f'Max number of retries exceeded for page: {url}')
+            raise RequesterError
+
+    def _get_session(self):
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=self._concurrency, limit_per_host=self._limit_per_host)
+            timeout = aiohttp.ClientTimeout(total=self._timeout)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout, headers=self._headers)
+        return self._session
+
+
+class _RateLimiter:
+    """Spaces out the moments `wait` returns by at least 1 / `rate` seconds."""
+
+    def __init__(self, rate):
+        self._interval = 1 / rate
+        self._next_time = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            now = time.monotonic()
+            if self._next_time > now:
+                await asyncio.sleep(self._next_time - now)
+                now = self._next_time
+            self._next_time = now + self._interval
+
+
+class CheckpointedWriter:
+    """Appends lines to the output file in batches and remembers which urls are done.
+
+    Lines of a url are written together with it, and the url is recorded in
+    the checkpoint file only after its lines are flushed to the output. So a
+    crashed run can be continued by skipping `done_urls`: at worst the lines
+    of the last unrecorded batch are written twice.
+    """
+
+    def __init__(self, out_file_path, checkpoint_file_path, buffer_size=1000):
+        self._buffer_size = buffer_size
+        self._out_file = open(out_file_path, 'ab')
+        self._checkpoint_file = open(checkpoint_file_path, 'a+')
+        self._checkpoint_file.seek(0)
+        self.done_urls: Set[str] = {url.strip() for url in self._checkpoint_file}
+        self._lines: List[bytes] = []
+        self._urls: List[str] = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def write(self, url, lines: Iterable[bytes]):
+        self._lines.extend(lines)
+        self._urls.append(url)
+        self.done_urls.add(url)
+        if len(self._urls) >= self._buffer_size:
+            self.flush()
+
+    def flush(self):
+        for line in self._lines:
+            self._out_file.write(line)
+            self._out_file.write(b'\n')
+        self._out_file.flush()
+        os.fsync(self._out_file.fileno())
+        for url in self._urls:
+            self._checkpoint_file.write(url)
+            self._checkpoint_file.write('\n')
+        self._checkpoint_file.flush()
+        self._lines.clear()
+        self._urls.clear()
+
+    def close(self):
+        self.flush()
+        self._out_file.close()
+        self._checkpoint_file.close()
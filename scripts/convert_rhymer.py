@@ -0,0 +1,27 @@
+from argparse import ArgumentParser
+
+from tom_rhymer.rhymer import Rhymer
+
+
+def _parse_args():
+    parser = ArgumentParser(
+        description='Converts a legacy pickled Rhymer model to the memory-mapped model file format. '
+        'Legacy models are upgraded on every load, a converted one loads at once.')
+    parser.add_argument(
+        '--rhymer-file-path', '-r', type=str, required=True, help='Path to the pickled Rhymer model, e.g. rhymer.pkl.')
+    parser.add_argument(
+        '--out-file-path', '-o', type=str, required=True, help='Output path to the Rhymer model file, e.g. rhymer.bin.')
+    return parser.parse_args()
+
+
+def main(rhymer_file_path, out_file_path):
+    rhymer = Rhymer.load(rhymer_file_path)
+    rhymer.save(out_file_path)
+
+
+if __name__ == '__main__':
+    args = _parse_args()
+    main(
+        rhymer_file_path=args.rhymer_file_path,
+        out_file_path=args.out_file_path,
+    )
@@ -1,13 +1,15 @@
 import argparse
 import asyncio
 import logging
+import os
 import re
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor
 from itertools import chain
 from pathlib import Path
 
 import orjson
 from bs4 import BeautifulSoup
-from common import Requester
+from common import CheckpointedWriter, Requester, RequesterError
 
 _logger = logging.getLogger(__name__)
 logging.basicConfig(
@@ -17,6 +19,11 @@ logging.basicConfig(
 )
 _COUNTER = 0
 
+# A page without a heading is a broken response, it's requested again after
+# `_WAIT_BEFORE_PAGE_RETRY * 2 ** i_retry` seconds.
+_N_PAGE_RETRIES = 5
+_WAIT_BEFORE_PAGE_RETRY = 1
+
 
 def _parse_args():
     parser = argparse.ArgumentParser(description='Crawls russian words and stresses from the wiktionary.')
@@ -27,58 +34,140 @@ def _parse_args():
         required=True,
         help='Path to the file with word urls. Could be obtained by scripts/crawl_word_urls.py script.')
     parser.add_argument('--out-file-path', '-o', type=str, required=True, help='Output path to save word stresses.')
+    parser.add_argument(
+        '--rate-limit', type=float, required=False, help='Max number of requests per second. Not limited if not set.')
+    parser.add_argument('--n-workers', type=int, default=10, help='Number of pages crawled at once.')
+    parser.add_argument(
+        '--n-parse-workers',
+        type=int,
+        default=os.cpu_count() or 1,
+        help='Number of processes parsing the pages.')
+    parser.add_argument(
+        '--restart',
+        action='store_true',
+        help='Remove the output and its checkpoint and crawl from scratch. '
+        'Otherwise urls from the checkpoint (<out-file-path>.done) are skipped.')
     return parser.parse_args()
 
 
-def main(word_urls_file_path, out_file_path):
-    requester = Requester(
-        concurrency=10,
-        timeout=5,
-        n_retries=5,
-    )
+def main(word_urls_file_path, out_file_path, rate_limit, n_workers, n_parse_workers, restart):
     loop = asyncio.get_event_loop()
     cor = _run(
-        requester=requester,
         word_urls_file_path=word_urls_file_path,
         out_file_path=out_file_path,
+        rate_limit=rate_limit,
+        n_workers=n_workers,
+        n_parse_workers=n_parse_workers,
+        restart=restart,
     )
     loop.run_until_complete(cor)
 
 
-async def _run(requester: Requester, word_urls_file_path, out_file_path):
+async def _run(word_urls_file_path, out_file_path, rate_limit, n_workers, n_parse_workers, restart):
     out_file_path = Path(out_file_path)
+    checkpoint_file_path = Path(f'{out_file_path}.done')
+    if restart:
+        for file_path in (out_file_path, checkpoint_file_path):
+            if file_path.exists():
+                file_path.unlink()
+
     with open(word_urls_file_path) as inp_file:
         word_urls = set(url.strip() for url in inp_file.readlines())
-    cors = [_crawl_word(requester, url, out_file_path) for url in word_urls]
-    if out_file_path.exists():
-        out_file_path.unlink()
-    await asyncio.gather(*cors)
-
-
-async def _crawl_word(requester: Requester, url, out_file_path):
+    requester = Requester(
+        concurrency=n_workers,
+        timeout=5,
+        n_retries=5,
+        limit_per_host=n_workers,
+        rate_limit=rate_limit,
+    )
+    with CheckpointedWriter(out_file_path, checkpoint_file_path) as writer, \
+            ProcessPoolExecutor(max_workers=n_parse_workers) as executor:
+        async with requester:
+            word_urls -= writer.done_urls
+            _logger.info(f'Urls to crawl: {len(word_urls)}')
+
+            # Urls are fed to a fixed number of workers through a small queue,
+            # so only the pages of `n_workers` urls are held at once. The feeder
+            # runs next to the workers, so if a worker fails the crawl stops
+            # instead of waiting for the queue forever.
+            queue = asyncio.Queue(maxsize=2 * n_workers)
+            tasks = [asyncio.ensure_future(_feed_urls(queue, word_urls, n_workers))]
+            tasks.extend(
+                asyncio.ensure_future(_crawl_words(requester, executor, queue, writer)) for _ in range(n_workers))
+            try:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+                for task in done:
+                    task.result()
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+
+async def _feed_urls(queue: asyncio.Queue, word_urls, n_workers):
+    for url in word_urls:
+        await queue.put(url)
+    for _ in range(n_workers):
+        await queue.put(None)
+
+
+async def _crawl_words(requester: Requester, executor, queue: asyncio.Queue, writer: CheckpointedWriter):
     while True:
-        page_text = await requester.get(url)
-        soup = BeautifulSoup(page_text)
+        url = await queue.get()
+        if url is None:
+            return
         try:
-            word = soup.find('h1', {'id': 'firstHeading'}).text.lower().strip()
+            payloads = await _get_word_payloads(requester, executor, url)
+        except BrokenExecutor:
+            # Every next page would fail the same way.
+            raise
+        except RequesterError:
+            # Not recorded in the checkpoint, so it's crawled again by the next run.
+            continue
+        except Exception:
+            _logger.exception(f'Failed to crawl: {url}')
+            continue
+        if payloads is not None:
+            writer.write(url, payloads)
+
+
+async def _get_word_payloads(requester: Requester, executor, url):
+    loop = asyncio.get_event_loop()
+    for i_retry in range(_N_PAGE_RETRIES):
+        page_text = await requester.get(url)
+        payloads = await loop.run_in_executor(executor, _parse_word_page, page_text)
+        if payloads is not None:
             break
-        except AttributeError:
-            _logger.info(f'Retrying {url}')
-            asyncio.sleep(3)
+        wait = _WAIT_BEFORE_PAGE_RETRY * 2**i_retry
+        _logger.info(f'Retrying [{i_retry + 1}/{_N_PAGE_RETRIES}] in {wait}s: {url}')
+        await asyncio.sleep(wait)
+    else:
+        _logger.warning(f'Max number of retries exceeded for page: {url}')
+        return None
 
     global _COUNTER
     _COUNTER += 1
     _logger.info(f'[{_COUNTER}] Crawling...')
+    return payloads
+
+
+def _parse_word_page(page_text):
+    """Returns json lines of the page's stressed words, or None if the page is broken."""
+    soup = BeautifulSoup(page_text)
+    heading = soup.find('h1', {'id': 'firstHeading'})
+    if heading is None:
+        return None
+    word = heading.text.lower().strip()
+
     if re.search(r'\s+', word):
-        return
+        return []
 
     roots_ps = re.findall(r'<p>.*?корень: <b>.*?</p>', page_text, flags=re.IGNORECASE | re.DOTALL)
     if not roots_ps:
-        return
+        return []
     roots = re.findall(r'корень: <b>-(.*?)-</b>', roots_ps[0], flags=re.IGNORECASE)
     roots = [r.lower() for r in roots if len(r) > 0]
     if not roots:
-        return
+        return []
     roots = [re.sub(r'\(.*?\)', '', r).strip() for r in roots]
 
     table = soup.find('table', {'class': 'morfotable ru'})
@@ -96,13 +185,7 @@ async def _crawl_word(requester: Requester, url, out_file_path):
     else:
         words = []
 
-    if words:
-        with open(out_file_path, "ab") as out_file:
-            for word in words:
-                payload = {'word': word, 'roots': roots}
-                payload = orjson.dumps(payload)
-                out_file.write(payload)
-                out_file.write(b'\n')
+    return [orjson.dumps({'word': word, 'roots': roots}) for word in words]
 
 
 def _is_stressed(word):
@@ -121,4 +204,8 @@ if __name__ == '__main__':
     main(
         word_urls_file_path=args.word_urls_file_path,
         out_file_path=args.out_file_path,
+        rate_limit=args.rate_limit,
+        n_workers=args.n_workers,
+        n_parse_workers=args.n_parse_workers,
+        restart=args.restart,
     )
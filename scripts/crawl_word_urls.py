@@ -24,16 +24,21 @@ def _parse_args():
 
 
 def main(out_file_path):
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(_run(out_file_path))
+
+
+async def _run(out_file_path):
     requester = Requester(
         concurrency=1,
         timeout=1,
         n_retries=10,
     )
-    loop = asyncio.get_event_loop()
-    loop.run_until_complete(_run(requester, out_file_path))
+    async with requester:
+        await _crawl_urls(requester, out_file_path)
 
 
-async def _run(requester: Requester, out_file_path):
+async def _crawl_urls(requester: Requester, out_file_path):
     url = _START_URL
     n_urls = 0
     with open(out_file_path, 'w') as out_file:
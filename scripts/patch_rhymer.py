@@ -0,0 +1,53 @@
+from argparse import ArgumentParser
+
+from tom_rhymer.rhymer import Rhymer
+
+
+def _parse_args():
+    parser = ArgumentParser(description='Applies vocabulary patch files to a Rhymer model without retraining.')
+    parser.add_argument(
+        '--rhymer-file-path',
+        '-r',
+        type=str,
+        required=True,
+        help='Path to the Rhymer model file, trained by scripts/train_rhymer.py script.')
+    parser.add_argument(
+        '--patch-file-paths',
+        '-p',
+        type=str,
+        nargs='+',
+        required=True,
+        help='Paths to the patch files (see Rhymer.apply_patch), applied in the given order.')
+    parser.add_argument(
+        '--out-file-path', '-o', type=str, required=True, help='Output path to the patched Rhymer model file.')
+    parser.add_argument(
+        '--n-workers',
+        '-n',
+        type=int,
+        default=1,
+        help='Number of worker processes to rebuild the rhyme indexes of the model, if it has them.')
+    return parser.parse_args()
+
+
+def main(rhymer_file_path, patch_file_paths, out_file_path, n_workers):
+    rhymer = Rhymer.load(rhymer_file_path)
+    has_neighbor_index, has_seed_index = rhymer.has_neighbor_index, rhymer.has_seed_index
+    for patch_file_path in patch_file_paths:
+        rhymer.apply_patch(patch_file_path)
+
+    # Patches drop the indexes, which are rebuilt for the new vocabulary.
+    if has_neighbor_index:
+        rhymer.build_neighbor_index(n_workers=n_workers)
+    elif has_seed_index:
+        rhymer.build_seed_index(n_workers=n_workers)
+    rhymer.save(out_file_path)
+
+
+if __name__ == '__main__':
+    args = _parse_args()
+    main(
+        rhymer_file_path=args.rhymer_file_path,
+        patch_file_paths=args.patch_file_paths,
+        out_file_path=args.out_file_path,
+        n_workers=args.n_workers,
+    )
@@ -1,11 +1,15 @@
 import argparse
 import logging
+import os
 import re
+from itertools import islice
 from typing import Optional
 
 import orjson
 import tqdm
 from russian_g2p.Grapheme2Phoneme import Grapheme2Phoneme
+from tom_rhymer.parallel import imap_in_processes
+from tom_rhymer.phoneme_cache import PhonemeCache
 
 _logger = logging.getLogger(__name__)
 logging.basicConfig(
@@ -21,6 +25,9 @@ _VOWELS = 'уеёыаоэяию'
 _VOWEL_CODES = {ord(c) for c in _VOWELS}
 _STRESS_PHONEMES = {'U0', 'O0', 'A0', 'E0', 'Y0', 'I0', 'U0l', 'O0l', 'A0l', 'E0l', 'Y0l', 'I0l'}
 
+_g2p: Optional[Grapheme2Phoneme] = None
+_phoneme_cache: Optional[PhonemeCache] = None
+
 
 def _parse_args():
     parser = argparse.ArgumentParser(description='Adds phonemes and stress position information to '
@@ -28,31 +35,113 @@ def _parse_args():
                                      'scripts/crawl_word_stresses.py script.')
     parser.add_argument('--word-stresses-file-path', '-s', type=str, required=True)
     parser.add_argument('--out-file-path', '-o', type=str, required=True)
+    parser.add_argument('--n-workers', '-n', type=int, default=1, help='Number of worker processes.')
+    parser.add_argument('--chunk-size', type=int, default=1000, help='Number of lines sent to a worker at once.')
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Continue a previous run from its progress file instead of starting over.')
+    parser.add_argument(
+        '--phoneme-cache-path',
+        type=str,
+        required=False,
+        help='Path to the phoneme cache file. Cached words are not passed to G2P, new ones are added.')
     return parser.parse_args()
 
 
-def main(word_stresses_file_path, out_file_path):
-    g2p = Grapheme2Phoneme()
-    with open(word_stresses_file_path) as inp_file, open(out_file_path, 'wb') as out_file:
-        for line in tqdm.tqdm(inp_file, desc='Words'):
-            data = orjson.loads(line)
-            word = _prepare_word_for_phonemization(data['word'])
-            if not word:
-                continue
-
+def main(word_stresses_file_path, out_file_path, n_workers, chunk_size, resume, phoneme_cache_path):
+    # The progress file keeps the number of processed input lines and the
+    # size of the output written for them. It's updated after every chunk.
+    progress_file_path = out_file_path + '.progress'
+    n_done_lines = 0
+    out_size = 0
+    if resume and os.path.exists(progress_file_path):
+        with open(progress_file_path, 'rb') as progress_file:
+            progress = orjson.loads(progress_file.read())
+        n_done_lines, out_size = progress['n_lines'], progress['out_size']
+        # The output is truncated to the recorded size, so it must have it all.
+        if not os.path.exists(out_file_path):
+            raise ValueError(f"Can't resume: {out_file_path} is missing. Run without --resume to start over")
+        if out_size > os.path.getsize(out_file_path):
+            raise ValueError(
+                f"Can't resume: {progress_file_path} records {out_size} bytes of output, but {out_file_path} "
+                f"is shorter. Run without --resume to start over")
+        _logger.info(f'Resuming after {n_done_lines} lines')
+    elif os.path.exists(progress_file_path):
+        # A progress file of another run would make a later --resume skip lines.
+        os.remove(progress_file_path)
+
+    with open(word_stresses_file_path) as inp_file, open(out_file_path, 'r+b' if out_size else 'wb') as out_file:
+        # Drops output of the chunk which was being written during the crash.
+        out_file.seek(out_size)
+        out_file.truncate()
+
+        lines = islice(inp_file, n_done_lines, None)
+        chunks = iter(lambda: list(islice(lines, chunk_size)), [])
+        if n_workers > 1:
+            chunk_payloads = imap_in_processes(
+                _phonemize_lines, chunks, n_workers, initializer=_init_worker, initargs=(phoneme_cache_path,))
+        else:
+            _init_worker(phoneme_cache_path)
+            chunk_payloads = map(_phonemize_lines, chunks)
+
+        # Workers only read the cache, new phonemes are written here.
+        phoneme_cache = PhonemeCache(phoneme_cache_path) if phoneme_cache_path else None
+        with tqdm.tqdm(desc='Words', initial=n_done_lines) as progress_bar:
+            for n_lines, payloads, new_word_phonemes in chunk_payloads:
+                if phoneme_cache is not None and new_word_phonemes:
+                    phoneme_cache.put_many(new_word_phonemes)
+                out_file.writelines(payloads)
+                out_file.flush()
+                os.fsync(out_file.fileno())
+                n_done_lines += n_lines
+                _write_progress(progress_file_path, n_done_lines, out_file.tell())
+                progress_bar.update(n_lines)
+
+    if os.path.exists(progress_file_path):
+        os.remove(progress_file_path)
+
+
+def _init_worker(phoneme_cache_path):
+    global _g2p, _phoneme_cache
+    _g2p = Grapheme2Phoneme()
+    _phoneme_cache = PhonemeCache(phoneme_cache_path) if phoneme_cache_path else None
+
+
+def _phonemize_lines(lines):
+    records = []
+    for line in lines:
+        data = orjson.loads(line)
+        word = _prepare_word_for_phonemization(data['word'])
+        if word:
+            records.append((data, word))
+
+    cached_word_phonemes = _phoneme_cache.get_many(word for _, word in records) if _phoneme_cache else {}
+    new_word_phonemes = []
+    payloads = []
+    for data, word in records:
+        phonemes = cached_word_phonemes.get(word)
+        if phonemes is None:
             try:
-                phonemes = g2p.word_to_phonemes(word)
+                phonemes = _g2p.word_to_phonemes(word)
             except AssertionError:
                 continue
+            new_word_phonemes.append((word, phonemes))
+
+        stress_idx = _get_stress_idx(phonemes)
+        if stress_idx is None:
+            continue
+
+        data.update({'word': word, 'phonemes': phonemes, 'stress_idx': stress_idx})
+        payloads.append(orjson.dumps(data) + b'\n')
+    return len(lines), payloads, new_word_phonemes
 
-            stress_idx = _get_stress_idx(phonemes)
-            if stress_idx is None:
-                continue
 
-            data.update({'word': word, 'phonemes': phonemes, 'stress_idx': stress_idx})
-            payload = orjson.dumps(data)
-            out_file.write(payload)
-            out_file.write(b'\n')
+def _write_progress(progress_file_path, n_lines, out_size):
+    tmp_file_path = progress_file_path + '.tmp'
+    with open(tmp_file_path, 'wb') as progress_file:
+        progress_file.write(orjson.dumps({'n_lines': n_lines, 'out_size': out_size}))
+    os.replace(tmp_file_path, progress_file_path)
 
 
 def _prepare_word_for_phonemization(word) -> Optional[str]:
@@ -106,4 +195,8 @@ if __name__ == '__main__':
     main(
         word_stresses_file_path=args.word_stresses_file_path,
         out_file_path=args.out_file_path,
+        n_workers=args.n_workers,
+        chunk_size=args.chunk_size,
+        resume=args.resume,
+        phoneme_cache_path=args.phoneme_cache_path,
     )
@@ -17,20 +17,18 @@ def _parse_args():
         required=True,
         help='Path to the white list of words to be used in rhymer (one line - one word).')
     parser.add_argument(
-        '--rhymer-file-path', '-r', type=str, required=True, help='Output path to the pickled Rhymer object.')
+        '--rhymer-file-path', '-r', type=str, required=True, help='Output path to the Rhymer model file.')
+    parser.add_argument(
+        '--n-workers', '-n', type=int, default=1, help='Number of worker processes parsing the phonemes file.')
     return parser.parse_args()
 
 
-def main(word_phonemes_file_path, allowed_words_file_path, rhymer_file_path):
-    allowed_words = []
+def main(word_phonemes_file_path, allowed_words_file_path, rhymer_file_path, n_workers):
     with open(allowed_words_file_path) as inp_file:
-        for line in inp_file:
-            word = line.strip()
-            allowed_words.append(word)
-    allowed_words = set(allowed_words)
+        allowed_words = {line.strip() for line in inp_file}
 
     rhymer = Rhymer()
-    rhymer.train(word_phonemes_file_path, allowed_words)
+    rhymer.train(word_phonemes_file_path, allowed_words, n_workers=n_workers)
     rhymer.save(rhymer_file_path)
 
 
@@ -40,4 +38,5 @@ if __name__ == '__main__':
         word_phonemes_file_path=args.word_phonemes_file_path,
         allowed_words_file_path=args.allowed_words_file_path,
         rhymer_file_path=args.rhymer_file_path,
+        n_workers=args.n_workers,
     )
@@ -0,0 +1,155 @@
+import asyncio
+import random
+from concurrent.futures import Executor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+from tom_rhymer.rhymer import Rhymer, Word
+
+
+class _InFlight:
+    def __init__(self, future: "asyncio.Future[Any]") -> None:
+        self.future = future
+        self.n_waiters = 0
+
+
+class AsyncRhymer:
+    """Runs `Rhymer` queries in an executor, without blocking the event loop.
+
+    Identical queries in flight are coalesced: they wait for the same result.
+    A caller which times out or is cancelled stops waiting, and a query nobody
+    waits for is cancelled if it hasn't started yet. A started query can't be
+    interrupted, but scheme generation is bounded by `max_n_steps`.
+
+    The default executor is a thread pool of `max_workers` threads, shut down
+    on `close`. It keeps the event loop responsive, but queries hold the GIL
+    for the most part, e.g. in the tree walks, so threads don't run them in
+    parallel. For CPU parallelism use `RhymerPool`, whose worker processes
+    load the model once. A process pool passed as `executor` works too, but
+    sends the model with every query.
+
+    Every scheme query gets its own `random.Random`, seeded from the instance
+    one in the order of the calls, so with `seed` set the results don't depend
+    on how the queries are scheduled.
+    """
+
+    def __init__(
+        self,
+        rhymer: Rhymer,
+        max_workers: Optional[int] = None,
+        executor: Optional[Executor] = None,
+        timeout: Optional[float] = None,
+        seed: Optional[int] = None,
+    ) -> None:
+        self._rhymer = rhymer
+        self._owns_executor = executor is None
+        self._executor = executor or ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="rhymer"
+        )
+        self._timeout = timeout
+        self._rng = random.Random(seed)
+        self._in_flight: Dict[Hashable, _InFlight] = {}
+
+    @property
+    def rhymer(self) -> Rhymer:
+        return self._rhymer
+
+    async def __aenter__(self) -> "AsyncRhymer":
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await asyncio.to_thread(self.close)
+
+    def close(self, cancel_pending: bool = False) -> None:
+        """Waits for the running queries and stops the executor, if it's owned.
+
+        If `cancel_pending` is set, queries which haven't started are cancelled.
+        """
+        if self._owns_executor:
+            self._executor.shutdown(wait=True, cancel_futures=cancel_pending)
+
+    async def get_rhymes(
+        self, seen_words: Sequence[Word], timeout: Optional[float] = None
+    ) -> List[Word]:
+        seen_words = list(seen_words)
+        return await self._run_coalesced(
+            ("get_rhymes", tuple(seen_words)),
+            partial(self._rhymer.get_rhymes, seen_words),
+            timeout,
+        )
+
+    async def get_ranked_rhymes(
+        self, seen_words: Sequence[Word], timeout: Optional[float] = None
+    ) -> List[Tuple[Word, int]]:
+        seen_words = list(seen_words)
+        return await self._run_coalesced(
+            ("get_ranked_rhymes", tuple(seen_words)),
+            partial(self._rhymer.get_ranked_rhymes, seen_words),
+            timeout,
+        )
+
+    async def get_rhymes_batch(
+        self, words: Sequence[Word], timeout: Optional[float] = None
+    ) -> List[List[Word]]:
+        words = list(words)
+        return await self._run_coalesced(
+            ("get_rhymes_batch", tuple(words)),
+            partial(self._rhymer.get_rhymes_batch, words),
+            timeout,
+        )
+
+    async def get_rhymes_by_scheme(
+        self,
+        scheme: List[str],
+        n_attempts: int = 20,
+        max_n_steps: int = 2000,
+        seed: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ) -> List[Word]:
+        """Returns rhymes for the scheme, see `Rhymer.get_rhymes_by_scheme`.
+
+        Scheme queries are random, so they are never coalesced. With `seed` the
+        result doesn't depend on the instance random state.
+        """
+        rng = random.Random(self._rng.getrandbits(64) if seed is None else seed)
+        future = self._submit(
+            partial(
+                self._rhymer.get_rhymes_by_scheme,
+                list(scheme),
+                n_attempts,
+                max_n_steps,
+                rng,
+            )
+        )
+        return await self._wait(_InFlight(future), timeout)
+
+    async def _run_coalesced(
+        self, key: Hashable, fn: Callable[[], Any], timeout: Optional[float]
+    ) -> Any:
+        in_flight = self._in_flight.get(key)
+        if in_flight is None:
+            in_flight = _InFlight(self._submit(fn))
+            self._in_flight[key] = in_flight
+            in_flight.future.add_done_callback(partial(self._forget, key, in_flight))
+        return await self._wait(in_flight, timeout)
+
+    def _submit(self, fn: Callable[[], Any]) -> "asyncio.Future[Any]":
+        return asyncio.get_running_loop().run_in_executor(self._executor, fn)
+
+    async def _wait(self, in_flight: _InFlight, timeout: Optional[float]) -> Any:
+        if timeout is None:
+            timeout = self._timeout
+        in_flight.n_waiters += 1
+        try:
+            # The shield keeps the query running for the other waiters.
+            return await asyncio.wait_for(asyncio.shield(in_flight.future), timeout)
+        finally:
+            in_flight.n_waiters -= 1
+            if not in_flight.n_waiters:
+                in_flight.future.cancel()
+
+    def _forget(
+        self, key: Hashable, in_flight: _InFlight, _: "asyncio.Future[Any]"
+    ) -> None:
+        if self._in_flight.get(key) is in_flight:
+            del self._in_flight[key]
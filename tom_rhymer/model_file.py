@@ -0,0 +1,111 @@
+import mmap
+import os
+import tempfile
+from typing import Dict, Tuple
+
+import numpy as np
+import orjson
+
+MAGIC: bytes = b"TOMRHYM\x00"
+FORMAT_VERSION: int = 2
+
+# File layout:
+#   MAGIC | version: uint32 | header size: uint32 | header: json | arrays
+# The header maps array names to their dtype, shape and offset in the file.
+# Arrays are aligned, so they can be used right from the memory map.
+_PREFIX_SIZE: int = len(MAGIC) + 8
+_ALIGNMENT: int = 64
+
+
+def is_model_file(file_path: str) -> bool:
+    with open(file_path, "rb") as inp_file:
+        return inp_file.read(len(MAGIC)) == MAGIC
+
+
+def write_model_file(file_path: str, arrays: Dict[str, np.ndarray], meta: Dict) -> None:
+    specs = {}
+    offset = 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        arrays[name] = array
+        offset = _align(offset)
+        specs[name] = {
+            "dtype": array.dtype.str,
+            "shape": list(array.shape),
+            "offset": offset,
+        }
+        offset += array.nbytes
+
+    # Offsets are relative to the end of the header, which is padded to the
+    # alignment boundary.
+    header = orjson.dumps({"meta": meta, "arrays": specs})
+    data_start = _align(_PREFIX_SIZE + len(header))
+    header += b" " * (data_start - _PREFIX_SIZE - len(header))
+
+    # The target may be mapped by a loaded model, truncating it in place would
+    # break the map. So the file is written aside and atomically replaces it.
+    out_dir, file_name = os.path.split(os.path.abspath(file_path))
+    fd, tmp_file_path = tempfile.mkstemp(prefix=f".{file_name}.", dir=out_dir)
+    try:
+        with os.fdopen(fd, "wb") as out_file:
+            out_file.write(MAGIC)
+            out_file.write(
+                np.array([FORMAT_VERSION, len(header)], dtype="<u4").tobytes()
+            )
+            out_file.write(header)
+            for name, array in arrays.items():
+                padding = data_start + specs[name]["offset"] - out_file.tell()
+                out_file.write(b"\x00" * padding)
+                out_file.write(array.tobytes())
+            out_file.flush()
+            os.fsync(out_file.fileno())
+        os.chmod(tmp_file_path, 0o666 & ~_get_umask())
+        os.replace(tmp_file_path, file_path)
+    except BaseException:
+        os.unlink(tmp_file_path)
+        raise
+
+
+def read_model_file(file_path: str) -> Tuple[Dict[str, np.ndarray], Dict]:
+    """Maps the model file into memory.
+
+    The arrays are read-only views of a shared memory map, so processes which
+    read the same file share its pages.
+    """
+    with open(file_path, "rb") as inp_file:
+        buffer = mmap.mmap(inp_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if buffer[: len(MAGIC)] != MAGIC:
+        raise ValueError(f"{file_path} is not a Rhymer model file")
+    version, header_size = np.frombuffer(
+        buffer, dtype="<u4", count=2, offset=len(MAGIC)
+    )
+    if version != FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported model file version {version}, expected {FORMAT_VERSION}"
+        )
+    header = orjson.loads(buffer[_PREFIX_SIZE : _PREFIX_SIZE + header_size])
+    data_start = _PREFIX_SIZE + int(header_size)
+
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        dtype = np.dtype(spec["dtype"])
+        shape = tuple(spec["shape"])
+        arrays[name] = np.frombuffer(
+            buffer,
+            dtype=dtype,
+            count=int(np.prod(shape)),
+            offset=data_start + spec["offset"],
+        ).reshape(shape)
+    return arrays, header["meta"]
+
+
+def _align(offset: int) -> int:
+    return (offset + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+def _get_umask() -> int:
+    # mkstemp creates the file readable by the owner only.
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
@@ -0,0 +1,93 @@
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class NeighborIndex:
+    """Precomputed rhyme search results for every vocabulary word.
+
+    Words with the same left and right signatures have the same rhymes, so they
+    share a row: `rows[word_id]` is the row of the word, and
+    `ids[offsets[row]:offsets[row + 1]]` with `levels` at the same positions are
+    the rhyme ids and level bitmasks found with `params`.
+    """
+
+    def __init__(
+        self,
+        params: np.ndarray,
+        rows: np.ndarray,
+        offsets: np.ndarray,
+        ids: np.ndarray,
+        levels: np.ndarray,
+    ) -> None:
+        self.params = params
+        self.rows = rows
+        self.offsets = offsets
+        self.ids = ids
+        self.levels = levels
+
+    @classmethod
+    def from_rows(
+        cls,
+        params: Sequence[Tuple[Tuple[int, int], Tuple[int, int]]],
+        rows: np.ndarray,
+        row_rhyme_levels: Sequence[Tuple[np.ndarray, np.ndarray]],
+    ) -> "NeighborIndex":
+        offsets = np.zeros(len(row_rhyme_levels) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(ids) for ids, _ in row_rhyme_levels])
+        return cls(
+            params=np.array(params, dtype=np.int32).reshape(len(params), 4),
+            rows=rows.astype(np.int32),
+            offsets=offsets,
+            ids=np.concatenate(
+                [np.zeros(0, dtype=np.int32)] + [ids for ids, _ in row_rhyme_levels]
+            ).astype(np.int32),
+            levels=np.concatenate(
+                [np.zeros(0, dtype=np.uint8)]
+                + [levels for _, levels in row_rhyme_levels]
+            ).astype(np.uint8),
+        )
+
+    def has_params(
+        self, params: Sequence[Tuple[Tuple[int, int], Tuple[int, int]]]
+    ) -> bool:
+        return np.array_equal(
+            self.params, np.array(params, dtype=np.int32).reshape(len(params), 4)
+        )
+
+    def get(self, word_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        row = self.rows[word_id]
+        start, end = self.offsets[row], self.offsets[row + 1]
+        return self.ids[start:end], self.levels[start:end]
+
+    def get_level_counts(self) -> np.ndarray:
+        """Returns numbers of rhymes of every word for every params level."""
+        row_counts = np.zeros((len(self.offsets) - 1, len(self.params)), dtype=np.int64)
+        for level in range(len(self.params)):
+            cumsum = np.zeros(len(self.levels) + 1, dtype=np.int64)
+            np.cumsum((self.levels >> level) & 1, out=cumsum[1:])
+            row_counts[:, level] = cumsum[self.offsets[1:]] - cumsum[self.offsets[:-1]]
+        return row_counts[self.rows]
+
+    def to_arrays(self, prefix: str) -> Dict[str, np.ndarray]:
+        return {
+            f"{prefix}.params": self.params,
+            f"{prefix}.rows": self.rows,
+            f"{prefix}.offsets": self.offsets,
+            f"{prefix}.ids": self.ids,
+            f"{prefix}.levels": self.levels,
+        }
+
+    @classmethod
+    def from_arrays(
+        cls, arrays: Dict[str, np.ndarray], prefix: str
+    ) -> Optional["NeighborIndex"]:
+        if f"{prefix}.rows" not in arrays:
+            return None
+        return cls(
+            params=arrays[f"{prefix}.params"],
+            rows=arrays[f"{prefix}.rows"],
+            offsets=arrays[f"{prefix}.offsets"],
+            ids=arrays[f"{prefix}.ids"],
+            levels=arrays[f"{prefix}.levels"],
+        )
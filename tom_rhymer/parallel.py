@@ -0,0 +1,44 @@
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.context import BaseContext
+from typing import Any, Callable, Iterable, Iterator, Optional, Tuple
+
+
+def get_fork_context() -> BaseContext:
+    """Returns the `fork` context where available and `spawn` otherwise.
+
+    Forked workers inherit the parent's memory copy-on-write, so a large model
+    doesn't have to be pickled to every worker.
+    """
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context("spawn")
+
+
+def imap_in_processes(
+    fn: Callable[[Any], Any],
+    items: Iterable[Any],
+    n_workers: int,
+    initializer: Callable[..., None],
+    initargs: Tuple,
+    mp_context: Optional[BaseContext] = None,
+) -> Iterator[Any]:
+    """Yields `fn(item)` for every item in order, computed in worker processes.
+
+    Only a few items per worker are submitted ahead, so items can be read
+    lazily from a large file.
+    """
+    with ProcessPoolExecutor(
+        max_workers=n_workers,
+        mp_context=mp_context,
+        initializer=initializer,
+        initargs=initargs,
+    ) as executor:
+        futures: deque = deque()
+        for item in items:
+            futures.append(executor.submit(fn, item))
+            if len(futures) >= 2 * n_workers:
+                yield futures.popleft().result()
+        while futures:
+            yield futures.popleft().result()
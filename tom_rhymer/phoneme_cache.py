@@ -0,0 +1,111 @@
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import orjson
+
+# Words are only queried one by one or in small chunks, so `IN (...)` lists
+# are kept below the SQLite variables limit.
+_MAX_N_QUERY_WORDS: int = 500
+
+
+class PhonemeCache:
+    """Persistent mapping of stressed words to their G2P phonemes, stored in SQLite.
+
+    Several processes can use the same file. A connection is opened lazily
+    in every process, so the cache can be pickled and inherited by forks.
+    `warm` loads all entries into memory for the fastest lookups.
+    """
+
+    def __init__(self, file_path: str) -> None:
+        self._file_path = file_path
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._memory: Dict[str, List[str]] = {}
+        self._get_connection()
+
+    def __getstate__(self) -> Dict:
+        return {"_file_path": self._file_path}
+
+    def __setstate__(self, state: Dict) -> None:
+        self.__init__(state["_file_path"])  # type: ignore[misc]
+
+    def _get_connection(self) -> sqlite3.Connection:
+        if self._connection is None or self._pid != os.getpid():
+            connection = sqlite3.connect(
+                self._file_path, timeout=30, check_same_thread=False
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS phonemes "
+                "(word TEXT PRIMARY KEY, phonemes BLOB NOT NULL)"
+            )
+            connection.commit()
+            self._connection = connection
+            self._pid = os.getpid()
+        return self._connection
+
+    def __len__(self) -> int:
+        with self._lock:
+            cursor = self._get_connection().execute("SELECT COUNT(*) FROM phonemes")
+            return cursor.fetchone()[0]
+
+    def get(self, word: str) -> Optional[List[str]]:
+        return self.get_many([word]).get(word)
+
+    def get_many(self, words: Iterable[str]) -> Dict[str, List[str]]:
+        found: Dict[str, List[str]] = {}
+        missed: List[str] = []
+        for word in words:
+            phonemes = self._memory.get(word)
+            if phonemes is not None:
+                found[word] = phonemes
+            else:
+                missed.append(word)
+
+        with self._lock:
+            connection = self._get_connection()
+            for start in range(0, len(missed), _MAX_N_QUERY_WORDS):
+                chunk = missed[start : start + _MAX_N_QUERY_WORDS]
+                cursor = connection.execute(
+                    "SELECT word, phonemes FROM phonemes "
+                    f"WHERE word IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                )
+                for word, phonemes in cursor:
+                    found[word] = orjson.loads(phonemes)
+        return found
+
+    def put(self, word: str, phonemes: Sequence[str]) -> None:
+        self.put_many([(word, phonemes)])
+
+    def put_many(self, items: Iterable[Tuple[str, Sequence[str]]]) -> None:
+        entries = [(word, list(phonemes)) for word, phonemes in items]
+        with self._lock:
+            connection = self._get_connection()
+            connection.executemany(
+                "INSERT OR REPLACE INTO phonemes (word, phonemes) VALUES (?, ?)",
+                [(word, orjson.dumps(phonemes)) for word, phonemes in entries],
+            )
+            connection.commit()
+        for word, phonemes in entries:
+            if word in self._memory:
+                self._memory[word] = phonemes
+
+    def warm(self) -> int:
+        """Loads all entries into memory and returns their number."""
+        with self._lock:
+            cursor = self._get_connection().execute(
+                "SELECT word, phonemes FROM phonemes"
+            )
+            memory = {word: orjson.loads(phonemes) for word, phonemes in cursor}
+        self._memory = memory
+        return len(memory)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None and self._pid == os.getpid():
+                self._connection.close()
+            self._connection = None
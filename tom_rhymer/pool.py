@@ -0,0 +1,120 @@
+import os
+import random
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Deque, Iterable, Iterator, List, Optional, Sequence, Union
+
+from tom_rhymer.parallel import get_fork_context
+from tom_rhymer.rhymer import Rhymer, Word
+
+_rhymer: Optional[Rhymer] = None
+
+
+class RhymerPool:
+    """Runs `Rhymer` queries in worker processes.
+
+    The model is loaded once. With the `fork` start method workers inherit it
+    copy-on-write, otherwise every worker loads it from `file_path`, which for
+    the memory-mapped model files means sharing the same page cache pages.
+
+    At most `max_pending` queries are in flight: `submit_*` calls block until a
+    slot is free.
+    """
+
+    def __init__(
+        self,
+        file_path: Optional[str] = None,
+        n_workers: Optional[int] = None,
+        max_pending: Optional[int] = None,
+    ) -> None:
+        n_workers = n_workers or os.cpu_count() or 1
+        context = get_fork_context()
+        if context.get_start_method() == "fork":
+            model: Union[Rhymer, Optional[str]] = Rhymer.load(file_path)
+        else:
+            model = file_path
+
+        self._executor = ProcessPoolExecutor(
+            max_workers=n_workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(model,),
+        )
+        self._max_pending = max_pending or 2 * n_workers
+        self._slots = threading.BoundedSemaphore(self._max_pending)
+
+    def __enter__(self) -> "RhymerPool":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self, cancel_pending: bool = False) -> None:
+        """Waits for the running queries and stops the workers.
+
+        If `cancel_pending` is set, queries which haven't started are cancelled.
+        """
+        self._executor.shutdown(wait=True, cancel_futures=cancel_pending)
+
+    def submit_get_rhymes(self, seen_words: Sequence[Word]) -> "Future[List[Word]]":
+        return self._submit(_get_rhymes, list(seen_words))
+
+    def submit_get_rhymes_by_scheme(
+        self, scheme: List[str], n_attempts: int = 20
+    ) -> "Future[List[Word]]":
+        return self._submit(_get_rhymes_by_scheme, scheme, n_attempts)
+
+    def get_rhymes(self, seen_words: Sequence[Word]) -> List[Word]:
+        return self.submit_get_rhymes(seen_words).result()
+
+    def get_rhymes_by_scheme(
+        self, scheme: List[str], n_attempts: int = 20
+    ) -> List[Word]:
+        return self.submit_get_rhymes_by_scheme(scheme, n_attempts).result()
+
+    def map_get_rhymes(
+        self, seen_words_seq: Iterable[Sequence[Word]]
+    ) -> Iterator[List[Word]]:
+        """Yields `get_rhymes` results in the input order.
+
+        The input is consumed lazily, at most `max_pending` queries ahead of
+        the yielded results.
+        """
+        # A result holds its slot only until it's done, so the number of
+        # results waiting to be yielded is bounded here.
+        futures: Deque[Future] = deque()
+        for seen_words in seen_words_seq:
+            if len(futures) >= self._max_pending:
+                yield futures.popleft().result()
+            futures.append(self._submit(_get_rhymes, list(seen_words)))
+        while futures:
+            yield futures.popleft().result()
+
+    def _submit(self, fn, *args) -> Future:
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+
+def _init_worker(model: Union[Rhymer, Optional[str]]) -> None:
+    global _rhymer
+    _rhymer = model if isinstance(model, Rhymer) else Rhymer.load(model)
+    # Forked workers inherit the parent random state and would generate the
+    # same schemes.
+    random.seed()
+
+
+def _get_rhymes(seen_words: List[Word]) -> List[Word]:
+    assert _rhymer is not None
+    return _rhymer.get_rhymes(seen_words)
+
+
+def _get_rhymes_by_scheme(scheme: List[str], n_attempts: int) -> List[Word]:
+    assert _rhymer is not None
+    return _rhymer.get_rhymes_by_scheme(scheme, n_attempts)
@@ -0,0 +1,85 @@
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, NamedTuple, Optional
+
+
+class QueryProfile(NamedTuple):
+    """Seconds spent in a query and in its stages."""
+
+    query: str
+    total: float
+    stages: Dict[str, float]
+
+
+class ProfileInfo(NamedTuple):
+    n_queries: Dict[str, int]
+    query_times: Dict[str, float]
+    stage_times: Dict[str, float]
+    stage_counts: Dict[str, int]
+
+
+class Profiler:
+    """Measures time spent in queries and in their stages.
+
+    Every thread profiles its own queries. A query started inside another
+    one is a part of it. Stages outside of any query, e.g. of a lazy
+    iterator, only count in the totals.
+    """
+
+    def __init__(
+        self, on_query: Optional[Callable[[QueryProfile], None]] = None
+    ) -> None:
+        self._on_query = on_query
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._n_queries: Dict[str, int] = defaultdict(int)
+        self._query_times: Dict[str, float] = defaultdict(float)
+        self._stage_times: Dict[str, float] = defaultdict(float)
+        self._stage_counts: Dict[str, int] = defaultdict(int)
+
+    @contextmanager
+    def query(self, name: str) -> Iterator[None]:
+        if getattr(self._local, "stages", None) is not None:
+            yield
+            return
+
+        stages: Dict[str, float] = defaultdict(float)
+        self._local.stages = stages
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            total = time.perf_counter() - start
+            self._local.stages = None
+            with self._lock:
+                self._n_queries[name] += 1
+                self._query_times[name] += total
+            if self._on_query is not None:
+                self._on_query(
+                    QueryProfile(query=name, total=total, stages=dict(stages))
+                )
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            stages = getattr(self._local, "stages", None)
+            if stages is not None:
+                stages[name] += elapsed
+            with self._lock:
+                self._stage_times[name] += elapsed
+                self._stage_counts[name] += 1
+
+    def info(self) -> ProfileInfo:
+        with self._lock:
+            return ProfileInfo(
+                n_queries=dict(self._n_queries),
+                query_times=dict(self._query_times),
+                stage_times=dict(self._stage_times),
+                stage_counts=dict(self._stage_counts),
+            )
@@ -1,25 +1,80 @@
+import logging
+import os
 import pickle
 import random
 import re
+import threading
 from collections import defaultdict
+from contextlib import nullcontext
 from dataclasses import dataclass
-from itertools import chain, cycle
-from typing import Dict, List, Optional, Sequence, Set, Tuple
+from functools import partial, wraps
+from importlib.resources import files
+from itertools import chain, islice
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    BinaryIO,
+    Callable,
+    ContextManager,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    TypeVar,
+    Union,
+    cast,
+)
 
+import numpy as np
 import orjson
-import pkg_resources
 import tqdm
-from pymorphy3 import MorphAnalyzer
-from russian_g2p.Grapheme2Phoneme import Grapheme2Phoneme
 
-from tom_rhymer.tree import Tree
+from tom_rhymer.cache import CacheInfo, LRUCache
+from tom_rhymer.model_file import is_model_file, read_model_file, write_model_file
+from tom_rhymer.neighbor_index import NeighborIndex
+from tom_rhymer.parallel import get_fork_context, imap_in_processes
+from tom_rhymer.phoneme_cache import PhonemeCache
+from tom_rhymer.profiling import ProfileInfo, Profiler, QueryProfile
+from tom_rhymer.seed_index import SeedIndex
+from tom_rhymer.tree import NO_TAG, FrozenTree, Tree, pad_paths
+from tom_rhymer.vocabulary import StringTable, Vocabulary, VocabularyBuilder
 
-_RHYMER_FILE_PATH: str = pkg_resources.resource_filename(
-    "tom_rhymer", "data/rhymer.pkl"
-)
+if TYPE_CHECKING:
+    from pymorphy3 import MorphAnalyzer
+    from russian_g2p.Grapheme2Phoneme import Grapheme2Phoneme
+
+_RHYMER_FILE_PATH: str = str(files("tom_rhymer").joinpath("data", "rhymer.bin"))
+_LEGACY_RHYMER_FILE_PATH: str = str(files("tom_rhymer").joinpath("data", "rhymer.pkl"))
+
+_logger = logging.getLogger(__name__)
 
-_morph: MorphAnalyzer = MorphAnalyzer()
-_g2p: Grapheme2Phoneme = Grapheme2Phoneme()
+_Signature = Tuple[int, ...]
+_F = TypeVar("_F", bound=Callable[..., Any])
+_Params = Tuple[Tuple[int, int], Tuple[int, int]]
+
+# A parsed line of the phonemes file: the word, its roots, its POS tag and
+# its left and right phoneme signatures.
+_TrainingRecord = Tuple[str, Set[str], Optional[str], Sequence[str], Sequence[str]]
+# The same fields of a block of lines, by columns.
+_TrainingColumns = Tuple[
+    List[str],
+    List[List[str]],
+    List[Optional[str]],
+    List[Sequence[str]],
+    List[Sequence[str]],
+]
+
+# Both are heavy to import and to create, so they are created on the first use:
+# in-vocabulary queries need neither of them. Neither is thread-safe, so they
+# are created and used under the locks.
+_morph: Optional["MorphAnalyzer"] = None
+_g2p: Optional["Grapheme2Phoneme"] = None
+_morph_lock = threading.Lock()
+_g2p_lock = threading.Lock()
 _STRESS_PHONEMES: Set[str] = {
     "U0",
     "O0",
@@ -42,7 +97,7 @@ class Word:
     roots: Set[str]
 
     def __hash__(self) -> int:
-        return id(self.word)
+        return hash(self.word)
 
     def __eq__(self, rhs: object) -> bool:
         if not isinstance(rhs, Word):
@@ -59,8 +114,43 @@ class Word:
         return re.sub(r"\++", "", self.word)
 
 
+class Words(Sequence[Word]):
+    """Read-only view of the `Rhymer` vocabulary, creating `Word` objects on access."""
+
+    def __init__(self, vocabulary: Vocabulary) -> None:
+        self._vocabulary = vocabulary
+
+    def __len__(self) -> int:
+        return len(self._vocabulary)
+
+    def __getitem__(  # type: ignore[override]
+        self, idx: Union[int, slice]
+    ) -> Union[Word, List[Word]]:
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("Word index out of range")
+        return Word(
+            word=self._vocabulary.get_word(idx),
+            roots=self._vocabulary.get_roots(idx),
+        )
+
+
+def _profiled_query(method: _F) -> _F:
+    @wraps(method)
+    def profiled_method(self: "Rhymer", *args: Any, **kwargs: Any) -> Any:
+        if self._profiler is None:
+            return method(self, *args, **kwargs)
+        with self._profiler.query(method.__name__):
+            return method(self, *args, **kwargs)
+
+    return cast(_F, profiled_method)
+
+
 class Rhymer:
-    _DEFAULT_PARAMS: List[Tuple[Tuple[int, int], Tuple[int, int]]] = [
+    _DEFAULT_PARAMS: List[_Params] = [
         ((4, 4), (1, 0)),
         ((4, 4), (0, 1)),
         ((4, 3), (1, 0)),
@@ -71,153 +161,1207 @@ class Rhymer:
         ((2, 2), (0, 0)),
     ]
 
+    # Rhyme ids and levels by signatures and params, before any filtering.
+    _cache: Optional[LRUCache[Tuple[np.ndarray, np.ndarray]]] = None
+    # Rhyme ids and levels for `_DEFAULT_PARAMS` of every vocabulary word.
+    _neighbor_index: Optional[NeighborIndex] = None
+    # Numbers of rhymes of every vocabulary word, to sample scheme seeds.
+    _seed_index: Optional[SeedIndex] = None
+    # G2P phonemes of words, shared with other processes and runs.
+    _phoneme_cache: Optional[PhonemeCache] = None
+    # Times of queries and their stages.
+    _profiler: Optional[Profiler] = None
+
     def __init__(self) -> None:
-        self._left_tree: Tree = Tree()
-        self._right_tree: Tree = Tree()
-        self._words: List[Word] = []
+        self._alphabet: Dict[str, int] = {}
+        self._vocabulary: Vocabulary = Vocabulary.from_words([], [], [])
+        self._build_trees(pad_paths([]), pad_paths([]))
 
     @property
-    def words(self) -> List[Word]:
-        return self._words
+    def words(self) -> Words:
+        return Words(self._vocabulary)
+
+    @property
+    def has_neighbor_index(self) -> bool:
+        return self._neighbor_index is not None
+
+    @property
+    def has_seed_index(self) -> bool:
+        return self._seed_index is not None
+
+    def enable_cache(self, max_size: int) -> None:
+        """Caches search results of the `max_size` most recent signatures and params.
+
+        Words with the same signatures share the cache entries. Results are
+        cached before the roots and part of speech filtering.
+        """
+        self._cache = LRUCache(max_size)
+
+    def disable_cache(self) -> None:
+        self._cache = None
+
+    def cache_info(self) -> Optional[CacheInfo]:
+        return self._cache.info() if self._cache is not None else None
+
+    def enable_profiling(
+        self, on_query: Optional[Callable[[QueryProfile], None]] = None
+    ) -> None:
+        """Measures time of G2P, POS tagging, tree walks, intersection and filtering.
+
+        Sampling of scheme seeds and tree builds of training and vocabulary
+        updates are stages too. `on_query` is called with the profile of every
+        finished query, and `profile_info` returns the totals and the number of
+        times every stage ran. Profiling adds a few microseconds to every query.
+        """
+        self._profiler = Profiler(on_query)
+
+    def disable_profiling(self) -> None:
+        self._profiler = None
+
+    def profile_info(self) -> Optional[ProfileInfo]:
+        return self._profiler.info() if self._profiler is not None else None
+
+    def _profile_stage(self, name: str) -> ContextManager[None]:
+        if self._profiler is None:
+            return nullcontext()
+        return self._profiler.stage(name)
+
+    def set_phoneme_cache(self, phoneme_cache: Optional[PhonemeCache]) -> None:
+        """Makes G2P results of out-of-vocabulary words and added words persistent.
+
+        Training also stores phonemes of the trained words in the cache.
+        """
+        self._phoneme_cache = phoneme_cache
+
+    def _get_phonemes(self, words: Sequence[str]) -> List[List[str]]:
+        with self._profile_stage("g2p"):
+            if self._phoneme_cache is None:
+                return [_word_to_phonemes(word) for word in words]
+
+            word_phonemes = self._phoneme_cache.get_many(words)
+            new_word_phonemes = {
+                word: _word_to_phonemes(word)
+                for word in words
+                if word not in word_phonemes
+            }
+            if new_word_phonemes:
+                self._phoneme_cache.put_many(new_word_phonemes.items())
+                word_phonemes.update(new_word_phonemes)
+            return [word_phonemes[word] for word in words]
+
+    def __getstate__(self) -> Dict:
+        state = dict(self.__dict__)
+        state.pop("_cache", None)
+        state.pop("_profiler", None)
+        return state
+
+    def __setstate__(self, state: Dict) -> None:
+        self.__dict__.update(state)
+        if isinstance(self._left_tree, Tree):
+            # The upgrade POS tags the whole vocabulary, so it's worth doing once.
+            _logger.warning(
+                "Upgrading a legacy pickled model, which repeats on every load. "
+                "Convert it once with scripts/convert_rhymer.py"
+            )
+            self._upgrade_legacy_trees()
 
     def train(
-        self, word_phonemes_file_path: str, allowed_words: Optional[Set[str]]
+        self,
+        word_phonemes_file_path: str,
+        allowed_words: Optional[Set[str]],
+        n_workers: int = 1,
+        block_size: int = 1 << 16,
     ) -> None:
-        with open(word_phonemes_file_path) as inp_file:
-            for line in tqdm.tqdm(inp_file, desc="Training"):
-                data: Dict = orjson.loads(line)
-                base_word: str = re.sub(r"\++", "", data["word"])
-                if allowed_words and base_word not in allowed_words:
-                    continue
-                word = Word(word=data["word"], roots=set(data["roots"]))
-                left_phonemes, right_phonemes = _get_phonemes_signatures(
-                    data["phonemes"]
+        """Adds words from the phonemes file and rebuilds the trees.
+
+        The file is read by blocks of about `block_size` bytes, and the lines
+        of a block are parsed at once into columns. Small blocks keep few
+        parsed objects alive, which keeps garbage collection passes cheap. With
+        `n_workers > 1` blocks are parsed and POS tagged in worker processes,
+        which is most of the training time. The model is the same for any
+        `n_workers`.
+        """
+        builder = VocabularyBuilder()
+        left_signatures: List[_Signature] = []
+        right_signatures: List[_Signature] = []
+        with open(word_phonemes_file_path, "rb") as inp_file:
+            blocks = _read_line_blocks(inp_file, block_size)
+            if n_workers > 1:
+                block_columns = imap_in_processes(
+                    _parse_training_block_in_worker,
+                    blocks,
+                    n_workers=n_workers,
+                    initializer=_init_training_worker,
+                    initargs=(allowed_words,),
+                )
+            else:
+                block_columns = (
+                    _parse_training_block(block, allowed_words) for block in blocks
                 )
-                self._left_tree.add(left_phonemes, word)
-                self._right_tree.add(right_phonemes, word)
-                self._words.append(word)
+
+            with tqdm.tqdm(
+                total=os.path.getsize(word_phonemes_file_path),
+                unit="B",
+                unit_scale=True,
+                desc="Training",
+            ) as progress:
+                for n_bytes, columns in block_columns:
+                    block_words, _, _, lefts, rights = columns
+                    for word, word_roots, pos_tag, left_phonemes, right_phonemes in zip(
+                        *columns
+                    ):
+                        builder.add(word, word_roots, pos_tag)
+                        left_signatures.append(self._encode(left_phonemes))
+                        right_signatures.append(self._encode(right_phonemes))
+                    if self._phoneme_cache is not None:
+                        self._phoneme_cache.put_many(
+                            zip(
+                                block_words,
+                                map(_join_phonemes_signatures, lefts, rights),
+                            )
+                        )
+                    progress.update(n_bytes)
+        self._extend_words(
+            np.arange(len(self._vocabulary)),
+            builder.build(),
+            left_signatures,
+            right_signatures,
+        )
+
+    def add_words(
+        self,
+        words: Sequence[Word],
+        phonemes: Optional[Sequence[Sequence[str]]] = None,
+    ) -> None:
+        """Adds words to the vocabulary, replacing the ones already present.
+
+        Phonemes are generated by G2P if not given. Only the new words are
+        POS tagged, but the trees are rebuilt, and word ids change.
+        """
+        if phonemes is None:
+            phonemes = self._get_phonemes([word.word for word in words])
+        records: List[_TrainingRecord] = [
+            (
+                word.word,
+                word.roots,
+                _get_pos_tag(str(word)),
+                *_get_phonemes_signatures(word_phonemes),
+            )
+            for word, word_phonemes in zip(words, phonemes)
+        ]
+        self._update_words(records, removed_words=set())
+
+    def remove_words(self, words: Iterable[str]) -> None:
+        """Removes stressed words from the vocabulary, ignoring unknown ones."""
+        self._update_words([], removed_words=set(words))
+
+    def apply_patch(self, patch_file_path: str) -> None:
+        """Applies a vocabulary patch file.
+
+        Every line of the file is a JSON object: either
+        `{"op": "add", "word": ..., "roots": [...], "phonemes": [...]}`, with
+        the fields of the phonemes file, or `{"op": "remove", "word": ...}`.
+        Operations are applied in order, with a single rebuild of the trees.
+        """
+        added_records: Dict[str, _TrainingRecord] = {}
+        removed_words: Set[str] = set()
+        with open(patch_file_path, "rb") as inp_file:
+            for line in inp_file:
+                if not line.strip():
+                    continue
+                data: Dict = orjson.loads(line)
+                op = data["op"]
+                if op == "add":
+                    _, columns = _parse_training_block(line, allowed_words=None)
+                    word, word_roots, pos_tag, left_phonemes, right_phonemes = next(
+                        zip(*columns)
+                    )
+                    removed_words.discard(word)
+                    added_records[word] = (
+                        word,
+                        set(word_roots),
+                        pos_tag,
+                        left_phonemes,
+                        right_phonemes,
+                    )
+                elif op == "remove":
+                    added_records.pop(data["word"], None)
+                    removed_words.add(data["word"])
+                else:
+                    raise ValueError(f"Unknown patch operation: {op}")
+        self._update_words(list(added_records.values()), removed_words)
+
+    def _update_words(
+        self, records: Sequence[_TrainingRecord], removed_words: Set[str]
+    ) -> None:
+        replaced_word_ids = self._vocabulary.find_ids(
+            removed_words | {record[0] for record in records}
+        )
+        builder = VocabularyBuilder()
+        left_signatures: List[_Signature] = []
+        right_signatures: List[_Signature] = []
+        for word, word_roots, pos_tag, left_phonemes, right_phonemes in records:
+            builder.add(word, word_roots, pos_tag)
+            # Phonemes are encoded in the order of `train`, so is the alphabet.
+            left_signatures.append(self._encode(left_phonemes))
+            right_signatures.append(self._encode(right_phonemes))
+        self._extend_words(
+            np.delete(np.arange(len(self._vocabulary)), replaced_word_ids),
+            builder.build(),
+            left_signatures,
+            right_signatures,
+        )
+
+    def _extend_words(
+        self,
+        kept_word_ids: np.ndarray,
+        vocabulary: Vocabulary,
+        left_signatures: Sequence[_Signature],
+        right_signatures: Sequence[_Signature],
+    ) -> None:
+        """Keeps the `kept_word_ids` words, followed by the `vocabulary` ones.
+
+        Kept words are sliced out of the columns and the trees, so only the new
+        words are handled one by one.
+        """
+        left_paths = _concat_paths(
+            self._left_tree.get_paths(self._left_nodes[kept_word_ids]),
+            pad_paths(left_signatures),
+        )
+        right_paths = _concat_paths(
+            self._right_tree.get_paths(self._right_nodes[kept_word_ids]),
+            pad_paths(right_signatures),
+        )
+        self._vocabulary = self._vocabulary.select(kept_word_ids).concat(vocabulary)
+        self._build_trees(left_paths, right_paths)
+
+    def _encode(self, phonemes: Sequence[str]) -> _Signature:
+        try:
+            # The alphabet is small and rarely grows, so the lookups go first.
+            return tuple(map(self._alphabet.__getitem__, phonemes))
+        except KeyError:
+            return tuple(
+                self._alphabet.setdefault(phoneme, len(self._alphabet))
+                for phoneme in phonemes
+            )
+
+    def _encode_known(self, phonemes: Sequence[str]) -> _Signature:
+        # Phonemes missing from the alphabet match nothing.
+        return tuple(self._alphabet.get(phoneme, NO_TAG) for phoneme in phonemes)
+
+    def _build_trees(self, left_paths: np.ndarray, right_paths: np.ndarray) -> None:
+        """Builds the trees of the word signatures, padded as by `pad_paths`."""
+        with self._profile_stage("trees"):
+            self._left_tree: FrozenTree = FrozenTree.from_paths(left_paths)
+            self._right_tree: FrozenTree = FrozenTree.from_paths(right_paths)
+        self._left_nodes: np.ndarray = self._left_tree.get_value_nodes(len(left_paths))
+        self._right_nodes: np.ndarray = self._right_tree.get_value_nodes(
+            len(right_paths)
+        )
+        if self._neighbor_index is not None or self._seed_index is not None:
+            _logger.warning(
+                "The vocabulary has changed, so the rhyme indexes are dropped. "
+                "Rebuild them with build_neighbor_index or build_seed_index"
+            )
+        self._neighbor_index = None
+        self._seed_index = None
+        if self._cache is not None:
+            # Cached rhymes are word ids of the previous vocabulary.
+            self._cache.clear()
+
+    def _upgrade_legacy_trees(self) -> None:
+        # Models pickled before `FrozenTree` keep a list of `Word` objects, the
+        # same objects in `Tree` nodes, and phoneme strings as tags.
+        left_paths = {
+            word.word: path for path, word in self._left_tree.iterate_on_items()
+        }
+        right_paths = {
+            word.word: path for path, word in self._right_tree.iterate_on_items()
+        }
+        words: List[Word] = self.__dict__.pop("_words")
+        self._alphabet = {}
+        self._vocabulary = Vocabulary.from_words(
+            [word.word for word in words],
+            [word.roots for word in words],
+            [_get_pos_tag(str(word)) for word in words],
+        )
+        self._build_trees(
+            pad_paths([self._encode(left_paths[word.word]) for word in words]),
+            pad_paths([self._encode(right_paths[word.word]) for word in words]),
+        )
 
     def save(self, out_file_path: str) -> None:
-        with open(out_file_path, "wb") as out_file:
-            pickle.dump(self, out_file)
+        arrays = {
+            **StringTable.from_strings(self._alphabet).to_arrays("alphabet"),
+            **self._vocabulary.to_arrays("vocabulary"),
+            **self._left_tree.to_arrays("left_tree"),
+            **self._right_tree.to_arrays("right_tree"),
+            "left_nodes": self._left_nodes,
+            "right_nodes": self._right_nodes,
+        }
+        if self._neighbor_index is not None:
+            arrays.update(self._neighbor_index.to_arrays("neighbor_index"))
+        if self._seed_index is not None:
+            arrays.update(self._seed_index.to_arrays("seed_index"))
+        write_model_file(out_file_path, arrays, meta={})
 
     @staticmethod
     def load(file_path: Optional[str] = None) -> "Rhymer":
-        file_path = file_path or _RHYMER_FILE_PATH
+        """Loads a model, memory mapping its arrays.
+
+        Vocabulary patches rebuild the trees and drop the rhyme indexes, so
+        they are applied once with scripts/patch_rhymer.py, not on every load.
+        """
+        if file_path is None:
+            file_path = _RHYMER_FILE_PATH
+            if not os.path.exists(file_path):
+                file_path = _LEGACY_RHYMER_FILE_PATH
+
+        if is_model_file(file_path):
+            return Rhymer._from_arrays(read_model_file(file_path)[0])
+
         with open(file_path, "rb") as inp_file:
             obj = pickle.load(inp_file)
             assert isinstance(obj, Rhymer)
             return obj
 
-    def _get_rhymes(
+    @staticmethod
+    def _from_arrays(arrays: Dict[str, np.ndarray]) -> "Rhymer":
+        rhymer = Rhymer.__new__(Rhymer)
+        alphabet = StringTable.from_arrays(arrays, "alphabet")
+        rhymer._alphabet = {alphabet[code]: code for code in range(len(alphabet))}
+        rhymer._vocabulary = Vocabulary.from_arrays(arrays, "vocabulary")
+        rhymer._left_tree = FrozenTree.from_arrays(arrays, "left_tree")
+        rhymer._right_tree = FrozenTree.from_arrays(arrays, "right_tree")
+        rhymer._left_nodes = arrays["left_nodes"]
+        rhymer._right_nodes = arrays["right_nodes"]
+        neighbor_index = NeighborIndex.from_arrays(arrays, "neighbor_index")
+        if neighbor_index is not None and neighbor_index.has_params(
+            rhymer._DEFAULT_PARAMS
+        ):
+            rhymer._neighbor_index = neighbor_index
+        seed_index = SeedIndex.from_arrays(arrays, "seed_index")
+        if seed_index is not None and seed_index.has_params(rhymer._DEFAULT_PARAMS):
+            rhymer._seed_index = seed_index
+        elif rhymer._neighbor_index is not None:
+            rhymer._seed_index = SeedIndex.from_counts(
+                rhymer._DEFAULT_PARAMS, rhymer._neighbor_index.get_level_counts()
+            )
+        return rhymer
+
+    def build_neighbor_index(self, n_workers: int = 1, chunk_size: int = 1024) -> None:
+        """Precomputes rhymes of every vocabulary word for all `_DEFAULT_PARAMS` levels.
+
+        The index is saved with the model, and queries for vocabulary words
+        become lookups. Any vocabulary change drops it.
+        """
+        rows, chunk_rhyme_levels = self._map_index_rows(
+            Rhymer._find_index_rows, n_workers, chunk_size, "Building index"
+        )
+        self._neighbor_index = NeighborIndex.from_rows(
+            self._DEFAULT_PARAMS, rows, list(chain.from_iterable(chunk_rhyme_levels))
+        )
+        self._seed_index = SeedIndex.from_counts(
+            self._DEFAULT_PARAMS, self._neighbor_index.get_level_counts()
+        )
+
+    def build_seed_index(self, n_workers: int = 1, chunk_size: int = 1024) -> None:
+        """Counts rhymes of every vocabulary word for all `_DEFAULT_PARAMS` levels.
+
+        Scheme generation then samples seed words only among the ones with
+        enough rhymes. The counts are saved with the model, they take 2 bytes
+        per word and level. `build_neighbor_index` builds them as well.
+        """
+        if self._neighbor_index is not None:
+            counts = self._neighbor_index.get_level_counts()
+        else:
+            rows, chunk_counts = self._map_index_rows(
+                Rhymer._count_index_rows, n_workers, chunk_size, "Counting rhymes"
+            )
+            row_counts = np.concatenate(
+                [np.zeros((0, len(self._DEFAULT_PARAMS)), dtype=np.int64)]
+                + chunk_counts
+            )
+            counts = row_counts[rows]
+        self._seed_index = SeedIndex.from_counts(self._DEFAULT_PARAMS, counts)
+
+    def _map_index_rows(
         self,
-        word: Word,
+        method: Callable[["Rhymer", np.ndarray], Any],
+        n_workers: int,
+        chunk_size: int,
+        desc: str,
+    ) -> Tuple[np.ndarray, List[Any]]:
+        # Words with the same pair of tree nodes have the same rhymes, so `method`
+        # gets chunks of one word id per pair, and `rows` maps words to pairs.
+        pairs = (self._left_nodes.astype(np.int64) << 32) | self._right_nodes
+        _, row_word_ids, rows = np.unique(pairs, return_index=True, return_inverse=True)
+        chunks = [
+            row_word_ids[start : start + chunk_size]
+            for start in range(0, len(row_word_ids), chunk_size)
+        ]
+
+        if n_workers > 1:
+            # Forked workers share the model copy-on-write instead of unpickling it.
+            results = list(
+                tqdm.tqdm(
+                    imap_in_processes(
+                        partial(_call_index_worker, method),
+                        chunks,
+                        n_workers=n_workers,
+                        initializer=_init_index_worker,
+                        initargs=(self,),
+                        mp_context=get_fork_context(),
+                    ),
+                    total=len(chunks),
+                    desc=desc,
+                )
+            )
+        else:
+            results = [method(self, chunk) for chunk in tqdm.tqdm(chunks, desc=desc)]
+        return rows.reshape(-1), results
+
+    def _find_index_rows(
+        self, word_ids: np.ndarray
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        rows = []
+        for word_id in word_ids.tolist():
+            left_phonemes, right_phonemes = self._get_word_id_signatures(word_id)
+            rows.append(
+                self._intersect_level_subtrees(
+                    self._get_left_level_subtrees(left_phonemes, self._DEFAULT_PARAMS),
+                    self._get_right_level_subtrees(
+                        right_phonemes, self._DEFAULT_PARAMS
+                    ),
+                )
+            )
+        return rows
+
+    def _count_index_rows(self, word_ids: np.ndarray) -> np.ndarray:
+        counts = np.zeros((len(word_ids), len(self._DEFAULT_PARAMS)), dtype=np.int64)
+        for i, (_, levels) in enumerate(self._find_index_rows(word_ids)):
+            for level in range(len(self._DEFAULT_PARAMS)):
+                counts[i, level] = np.count_nonzero((levels >> level) & 1)
+        return counts
+
+    def _get_word_id_rhyme_levels(self, word_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        if self._neighbor_index is not None:
+            return self._neighbor_index.get(word_id)
+        return self._get_rhyme_levels(
+            self._get_word_id_signatures(word_id), self._DEFAULT_PARAMS
+        )
+
+    def _get_rhyme_ids(
+        self,
+        signatures: Tuple[_Signature, _Signature],
         min_n_matches: Tuple[int, int],
         max_n_skips: Tuple[int, int],
-    ) -> List[Word]:
-        phonemes: List[str] = _g2p.word_to_phonemes(word.word)
-        left_phonemes, right_phonemes = _get_phonemes_signatures(phonemes)
-        left_rhymes = self._left_tree.iterate_on_nodes(
-            path=left_phonemes,
-            min_n_matches=min_n_matches[0],
-            max_n_skips=max_n_skips[0],
+    ) -> np.ndarray:
+        rhyme_ids, _ = self._get_rhyme_levels(
+            signatures, [(min_n_matches, max_n_skips)]
         )
-        right_rhymes = self._right_tree.iterate_on_nodes(
-            path=right_phonemes,
-            min_n_matches=min_n_matches[1],
-            max_n_skips=max_n_skips[1],
+        return rhyme_ids
+
+    def _get_rhyme_levels(
+        self,
+        signatures: Tuple[_Signature, _Signature],
+        params: Sequence[_Params],
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Finds rhymes for all params levels, walking each tree once.
+
+        Returns unique rhyme ids and the bitmasks of levels they satisfy:
+        bit `i` is set if the rhyme is found with `params[i]`.
+        """
+        left_phonemes, right_phonemes = signatures
+        return self._get_cached_rhyme_levels(
+            signatures,
+            params,
+            lambda: self._intersect_level_subtrees(
+                self._get_left_level_subtrees(left_phonemes, params),
+                self._get_right_level_subtrees(right_phonemes, params),
+            ),
         )
-        all_rhymes: Set[Word] = set(left_rhymes) & set(right_rhymes)
 
-        rhymes: List[Word] = []
-        for rhyme in all_rhymes:
-            if rhyme.roots & word.roots:
+    def _get_cached_rhyme_levels(
+        self,
+        signatures: Tuple[_Signature, _Signature],
+        params: Sequence[_Params],
+        find_rhyme_levels: Callable[[], Tuple[np.ndarray, np.ndarray]],
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        cache = self._cache
+        if cache is None:
+            return find_rhyme_levels()
+
+        key = (signatures, tuple(params))
+        rhyme_levels = cache.get(key)
+        if rhyme_levels is None:
+            rhyme_levels = find_rhyme_levels()
+            for array in rhyme_levels:
+                array.setflags(write=False)
+            cache.put(key, rhyme_levels)
+        return rhyme_levels
+
+    def _get_left_level_subtrees(
+        self, left_phonemes: _Signature, params: Sequence[_Params]
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        with self._profile_stage("left_tree"):
+            return self._left_tree.get_level_subtrees(
+                left_phonemes,
+                [
+                    (min_n_matches[0], max_n_skips[0])
+                    for min_n_matches, max_n_skips in params
+                ],
+            )
+
+    def _get_right_level_subtrees(
+        self, right_phonemes: _Signature, params: Sequence[_Params]
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        with self._profile_stage("right_tree"):
+            return self._right_tree.get_level_subtrees(
+                right_phonemes,
+                [
+                    (min_n_matches[1], max_n_skips[1])
+                    for min_n_matches, max_n_skips in params
+                ],
+            )
+
+    def _intersect_level_subtrees(
+        self,
+        left_level_subtrees: List[Tuple[np.ndarray, np.ndarray]],
+        right_level_subtrees: List[Tuple[np.ndarray, np.ndarray]],
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        with self._profile_stage("intersection"):
+            level_rhyme_ids = []
+            for left_subtrees, right_subtrees in zip(
+                left_level_subtrees, right_level_subtrees
+            ):
+                # Only the smaller side is materialized. Its words are checked
+                # against the other side by the nodes they are stored in.
+                if self._left_tree.count_values(
+                    *left_subtrees
+                ) <= self._right_tree.count_values(*right_subtrees):
+                    rhyme_ids = self._left_tree.get_values(*left_subtrees)
+                    mask = FrozenTree.in_subtrees(
+                        self._right_nodes[rhyme_ids], *right_subtrees
+                    )
+                else:
+                    rhyme_ids = self._right_tree.get_values(*right_subtrees)
+                    mask = FrozenTree.in_subtrees(
+                        self._left_nodes[rhyme_ids], *left_subtrees
+                    )
+                level_rhyme_ids.append(rhyme_ids[mask])
+
+            if len(level_rhyme_ids) == 1:
+                return level_rhyme_ids[0], np.ones(
+                    len(level_rhyme_ids[0]), dtype=np.uint32
+                )
+
+            rhyme_ids, inverse = np.unique(
+                np.concatenate(level_rhyme_ids), return_inverse=True
+            )
+            levels = np.zeros(len(rhyme_ids), dtype=np.uint32)
+            np.bitwise_or.at(
+                levels,
+                inverse,
+                np.repeat(
+                    np.left_shift(1, np.arange(len(level_rhyme_ids), dtype=np.uint32)),
+                    [len(ids) for ids in level_rhyme_ids],
+                ),
+            )
+            return rhyme_ids, levels
+
+    def _get_signatures(self, word: Word) -> Tuple[_Signature, _Signature]:
+        (signatures,) = self._get_many_signatures([word])
+        return signatures
+
+    def _get_many_signatures(
+        self, words: Sequence[Word]
+    ) -> List[Tuple[_Signature, _Signature]]:
+        """Returns signatures of the words, with G2P run once for the new ones."""
+        word_ids = [self._vocabulary.find(word.word) for word in words]
+        new_words = [
+            word.word for word, word_id in zip(words, word_ids) if word_id is None
+        ]
+        new_word_phonemes = iter(self._get_phonemes(new_words) if new_words else [])
+
+        signatures = []
+        for word_id in word_ids:
+            if word_id is not None:
+                signatures.append(self._get_word_id_signatures(word_id))
                 continue
-            rhymes.append(rhyme)
+            left_phonemes, right_phonemes = _get_phonemes_signatures(
+                next(new_word_phonemes)
+            )
+            signatures.append(
+                (self._encode_known(left_phonemes), self._encode_known(right_phonemes))
+            )
+        return signatures
 
-        return rhymes
+    def _get_word_id_signatures(self, word_id: int) -> Tuple[_Signature, _Signature]:
+        return (
+            self._left_tree.get_path(int(self._left_nodes[word_id])),
+            self._right_tree.get_path(int(self._right_nodes[word_id])),
+        )
+
+    def _get_root_ids(self, words: Sequence[Word]) -> np.ndarray:
+        root_ids: List[int] = []
+        for word in words:
+            word_id = self._vocabulary.find(word.word)
+            if word_id is not None:
+                root_ids.extend(self._vocabulary.get_root_ids(word_id).tolist())
+            else:
+                root_ids.extend(self._vocabulary.find_root_ids(word.roots))
+        return np.array(root_ids, dtype=np.int32)
+
+    def get_pos(self, word: Word) -> Optional[str]:
+        word_id = self._vocabulary.find(word.word)
+        if word_id is not None:
+            return self._vocabulary.get_pos(word_id)
+        return _get_pos_tag(str(word))
+
+    def _get_pos_id(self, word: Word) -> int:
+        word_id = self._vocabulary.find(word.word)
+        if word_id is not None:
+            return int(self._vocabulary.pos_ids[word_id])
+        with self._profile_stage("pos"):
+            pos_tag = _get_pos_tag(str(word))
+        return self._vocabulary.get_pos_id(pos_tag)
 
+    def group_by_pos(self, words: Sequence[Word]) -> Dict[Optional[str], List[Word]]:
+        pos_to_words: Dict[Optional[str], List[Word]] = defaultdict(list)
+        for word in words:
+            pos_to_words[self.get_pos(word)].append(word)
+        return dict(pos_to_words)
+
+    @_profiled_query
     def get_rhymes_by_scheme(
-        self, scheme: List[str], n_attempts: int = 20
+        self,
+        scheme: List[str],
+        n_attempts: int = 20,
+        max_n_steps: int = 2000,
+        rng: Optional[random.Random] = None,
     ) -> List[Word]:
-        rhymes: Optional[List[Word]] = None
+        """Returns rhymes for the scheme, e.g. `list("ABAB")`.
 
-        for _, params in zip(range(n_attempts), cycle(self._DEFAULT_PARAMS)):
-            min_n_matches, max_n_skips = params
-            rhymes = self.try_get_rhymes_by_scheme(
-                scheme=scheme,
-                min_n_matches=min_n_matches,
-                max_n_skips=max_n_skips,
-            )
-            if rhymes is not None:
-                break
+        Words of a letter rhyme with the first of them, neighbour ones are
+        different parts of speech, and no two words share a root. Letters are
+        filled one by one from random seed words, backtracking when a letter
+        can't be filled, and at most `n_attempts` seeds are sampled in total.
+        The search also stops after `max_n_steps` tried words, so its time is
+        bounded. With the seed index, see `build_seed_index`, seeds are only
+        words with enough rhymes.
 
-        if rhymes is None:
+        Seeds are drawn from `rng`, or from the `random` module if it's None.
+        """
+        try:
+            chains = _SchemeSearch(self, n_attempts, max_n_steps, rng).search(scheme)
+        except _SchemeSearchBudgetError:
+            raise ValueError(
+                f"Can't find enough rhymes in {max_n_steps} steps. "
+                "Try to increase max_n_steps"
+            ) from None
+        if chains is None:
             raise ValueError("Can't find enough rhymes. Try to increase n_attempts")
 
-        return rhymes
+        return [self.words[chains[code].pop()] for code in scheme]
 
+    @_profiled_query
     def try_get_rhymes_by_scheme(
         self,
         scheme: List[str],
         min_n_matches: Tuple[int, int],
         max_n_skips: Tuple[int, int],
+        rng: Optional[random.Random] = None,
     ) -> Optional[List[Word]]:
-        code_to_words: Dict[str, List[Word]] = defaultdict(list)
+        return self._try_get_rhymes_by_scheme(
+            scheme=scheme,
+            get_rhyme_ids=lambda word_id: self._get_rhyme_ids(
+                self._get_word_id_signatures(word_id), min_n_matches, max_n_skips
+            ),
+            params=(min_n_matches, max_n_skips),
+            rng=rng,
+        )
 
-        seen_roots: Set[str] = set()
+    def _try_get_rhymes_by_scheme(
+        self,
+        scheme: List[str],
+        get_rhyme_ids: Callable[[int], np.ndarray],
+        params: Optional[_Params] = None,
+        rng: Optional[random.Random] = None,
+    ) -> Optional[List[Word]]:
+        code_to_word_ids: Dict[str, List[int]] = defaultdict(list)
+
+        seen_root_ids: List[int] = []
         for code in scheme:
-            words = code_to_words[code]
-            if not words:
-                word = random.choice(self._words)
-                words.append(word)
-                seen_roots |= word.roots
+            word_ids = code_to_word_ids[code]
+            if not word_ids:
+                seed_id = self._sample_seed_id(scheme.count(code), params, rng)
+                if seed_id is None:
+                    return None
+                word_id = seed_id
             else:
-                prev_word = words[-1]
-                prev_pos = _morph.parse(str(prev_word))[0].tag.POS
-                rhymes = self._get_rhymes(prev_word, min_n_matches, max_n_skips)
-                rhyme_found = False
-                for word in rhymes:
-                    if word.roots & seen_roots:
-                        continue
-                    pos = _morph.parse(str(word))[0].tag.POS
-                    if pos == prev_pos:
-                        continue
-                    words.append(word)
-                    seen_roots |= word.roots
-                    rhyme_found = True
-                    break
-                if not rhyme_found:
+                prev_word_id = word_ids[-1]
+                rhyme_ids = get_rhyme_ids(prev_word_id)
+                rhyme_ids = rhyme_ids[
+                    self._vocabulary.pos_ids[rhyme_ids]
+                    != self._vocabulary.pos_ids[prev_word_id]
+                ]
+                rhyme_ids = rhyme_ids[
+                    ~self._vocabulary.has_any_root(
+                        rhyme_ids, np.array(seen_root_ids, dtype=np.int32)
+                    )
+                ]
+                if not len(rhyme_ids):
                     return None
+                word_id = int(rhyme_ids[0])
+            word_ids.append(word_id)
+            seen_root_ids.extend(self._vocabulary.get_root_ids(word_id).tolist())
 
         rhymes: List[Word] = []
         for code in scheme:
-            word = code_to_words[code].pop()
-            rhymes.append(word)
+            word_id = code_to_word_ids[code].pop()
+            rhymes.append(self.words[word_id])
 
         return rhymes
 
+    def _sample_seed_id(
+        self,
+        n_rhymes: int,
+        params: Optional[_Params] = None,
+        rng: Optional[random.Random] = None,
+    ) -> Optional[int]:
+        """Returns a random word id with at least `n_rhymes` rhymes, or None.
+
+        The rhymes are counted with `params`, or with any of `_DEFAULT_PARAMS`
+        if it's None. Without the seed index, or for other params, any word
+        can be returned.
+        """
+        with self._profile_stage("seed"):
+            if self._seed_index is not None:
+                if params is None:
+                    return self._seed_index.sample(n_rhymes, rng=rng)
+                if params in self._DEFAULT_PARAMS:
+                    return self._seed_index.sample(
+                        n_rhymes, self._DEFAULT_PARAMS.index(params), rng
+                    )
+            if not len(self._vocabulary):
+                return None
+            return (rng or random).randrange(len(self._vocabulary))
+
+    @_profiled_query
     def get_rhymes(self, seen_words: Sequence[Word]) -> List[Word]:
-        rhymes: Set[Word] = set()
-        word = seen_words[-1]
-        prev_pos = _morph.parse(str(word))[0].tag.POS
-        seen_roots = set(chain(*[w.roots for w in seen_words]))
-
-        for params in self._DEFAULT_PARAMS:
-            min_n_matches, max_n_skips = params
-            for rhyme in self._get_rhymes(
-                word=word,
-                min_n_matches=min_n_matches,
-                max_n_skips=max_n_skips,
-            ):
-                pos = _morph.parse(str(rhyme))[0].tag.POS
-                if (rhyme.roots & seen_roots) or (pos == prev_pos):
-                    continue
-                rhymes.add(rhyme)
-        return list(rhymes)
+        return [rhyme for rhyme, _ in self.get_ranked_rhymes(seen_words)]
+
+    def iter_rhymes(
+        self, seen_words: Sequence[Word], limit: Optional[int] = None
+    ) -> Iterator[Word]:
+        """Yields `get_rhymes(seen_words)` lazily, in the same order.
+
+        Rhymes are found as by `get_rhymes`, in one walk of every tree, but
+        `Word` objects are made only for the yielded ones.
+        """
+        rhymes = self._iter_rhymes(seen_words)
+        if limit is not None:
+            rhymes = islice(rhymes, limit)
+        return rhymes
+
+    def _iter_rhymes(self, seen_words: Sequence[Word]) -> Iterator[Word]:
+        rhyme_ids, _ = self._rank_rhyme_ids(
+            seen_words, *self._find_rhyme_levels(seen_words[-1])
+        )
+        for rhyme_id in rhyme_ids.tolist():
+            yield self.words[rhyme_id]
+
+    def _find_rhyme_levels(self, word: Word) -> Tuple[np.ndarray, np.ndarray]:
+        word_id = self._vocabulary.find(word.word)
+        if word_id is not None:
+            return self._get_word_id_rhyme_levels(word_id)
+        return self._get_rhyme_levels(self._get_signatures(word), self._DEFAULT_PARAMS)
+
+    @_profiled_query
+    def get_ranked_rhymes(self, seen_words: Sequence[Word]) -> List[Tuple[Word, int]]:
+        """Returns rhymes for the last seen word with their levels.
+
+        The level is the index of the strictest `_DEFAULT_PARAMS` entry the rhyme
+        is found with. Rhymes are sorted by it, strictest first.
+        """
+        return self._rank_rhymes(seen_words, *self._find_rhyme_levels(seen_words[-1]))
+
+    def _rank_rhymes(
+        self, seen_words: Sequence[Word], rhyme_ids: np.ndarray, levels: np.ndarray
+    ) -> List[Tuple[Word, int]]:
+        rhyme_ids, strictest_levels = self._rank_rhyme_ids(
+            seen_words, rhyme_ids, levels
+        )
+        return [
+            (self.words[rhyme_id], level)
+            for rhyme_id, level in zip(rhyme_ids.tolist(), strictest_levels.tolist())
+        ]
+
+    def _rank_rhyme_ids(
+        self, seen_words: Sequence[Word], rhyme_ids: np.ndarray, levels: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        pos_id = self._get_pos_id(seen_words[-1])
+        with self._profile_stage("filter"):
+            mask = self._vocabulary.pos_ids[rhyme_ids] != pos_id
+            mask &= ~self._vocabulary.has_any_root(
+                rhyme_ids, self._get_root_ids(seen_words)
+            )
+            rhyme_ids, levels = rhyme_ids[mask], levels[mask]
+
+        strictest_levels = _get_strictest_levels(levels, len(self._DEFAULT_PARAMS))
+        order = np.argsort(strictest_levels, kind="stable")
+        return rhyme_ids[order], strictest_levels[order]
+
+    @_profiled_query
+    def get_rhymes_batch(self, words: Sequence[Word]) -> List[List[Word]]:
+        """Returns `get_rhymes([word])` for every word.
+
+        Repeated words are processed once, G2P runs once for all words missing
+        from the vocabulary, and words with the same left or right signature
+        share the corresponding tree walk.
+        """
+        unique_words: Dict[str, Word] = {word.word: word for word in words}
+        word_rhymes: Dict[str, List[Word]] = {}
+        if self._neighbor_index is not None:
+            for word_str, word in list(unique_words.items()):
+                word_id = self._vocabulary.find(word_str)
+                if word_id is not None:
+                    ranked_rhymes = self._rank_rhymes(
+                        [word], *self._neighbor_index.get(word_id)
+                    )
+                    word_rhymes[word_str] = [rhyme for rhyme, _ in ranked_rhymes]
+                    del unique_words[word_str]
+
+        word_signatures = dict(
+            zip(unique_words, self._get_many_signatures(list(unique_words.values())))
+        )
+
+        left_level_subtrees: Dict[_Signature, List[Tuple[np.ndarray, np.ndarray]]] = {}
+        right_level_subtrees: Dict[_Signature, List[Tuple[np.ndarray, np.ndarray]]] = {}
+
+        def find_rhyme_levels(
+            left_phonemes: _Signature, right_phonemes: _Signature
+        ) -> Tuple[np.ndarray, np.ndarray]:
+            if left_phonemes not in left_level_subtrees:
+                left_level_subtrees[left_phonemes] = self._get_left_level_subtrees(
+                    left_phonemes, self._DEFAULT_PARAMS
+                )
+            if right_phonemes not in right_level_subtrees:
+                right_level_subtrees[right_phonemes] = self._get_right_level_subtrees(
+                    right_phonemes, self._DEFAULT_PARAMS
+                )
+            return self._intersect_level_subtrees(
+                left_level_subtrees[left_phonemes], right_level_subtrees[right_phonemes]
+            )
+
+        signature_rhyme_levels: Dict[
+            Tuple[_Signature, _Signature], Tuple[np.ndarray, np.ndarray]
+        ] = {}
+        for signatures in set(word_signatures.values()):
+            signature_rhyme_levels[signatures] = self._get_cached_rhyme_levels(
+                signatures,
+                self._DEFAULT_PARAMS,
+                lambda: find_rhyme_levels(*signatures),
+            )
+
+        for word_str, signatures in word_signatures.items():
+            ranked_rhymes = self._rank_rhymes(
+                [unique_words[word_str]], *signature_rhyme_levels[signatures]
+            )
+            word_rhymes[word_str] = [rhyme for rhyme, _ in ranked_rhymes]
+
+        return [list(word_rhymes[word.word]) for word in words]
+
+
+_training_allowed_words: Optional[Set[str]] = None
+
+
+def _concat_paths(head: np.ndarray, tail: np.ndarray) -> np.ndarray:
+    width = max(head.shape[1], tail.shape[1])
+    return np.concatenate(
+        [
+            np.pad(paths, ((0, 0), (0, width - paths.shape[1])), constant_values=NO_TAG)
+            for paths in (head, tail)
+        ]
+    )
+
+
+def _read_line_blocks(inp_file: BinaryIO, block_size: int) -> Iterator[bytes]:
+    """Yields blocks of about `block_size` bytes which end at line ends."""
+    tail = b""
+    while True:
+        data = inp_file.read(block_size)
+        if not data:
+            break
+        end = data.rfind(b"\n") + 1
+        if not end:
+            tail += data
+            continue
+        yield tail + data[:end]
+        tail = data[end:]
+    if tail:
+        yield tail
+
+
+def _parse_training_block(
+    block: bytes, allowed_words: Optional[Set[str]]
+) -> Tuple[int, _TrainingColumns]:
+    # Lines are parsed by a single call, as items of one JSON array.
+    lines = [line for line in block.split(b"\n") if line.strip()]
+    items: List[Dict] = orjson.loads(b"[" + b",".join(lines) + b"]")
 
+    words: List[str] = []
+    roots: List[List[str]] = []
+    pos_tags: List[Optional[str]] = []
+    lefts: List[Sequence[str]] = []
+    rights: List[Sequence[str]] = []
+    # Stress variants of a word share its POS tag.
+    base_word_pos_tags: Dict[str, Optional[str]] = {}
+    for item in items:
+        word: str = item["word"]
+        if "+" not in word:
+            raise ValueError(f"Word {word} in not stressed. `+` sign must be present.")
+        base_word = word.replace("+", "")
+        if allowed_words and base_word not in allowed_words:
+            continue
+        if base_word not in base_word_pos_tags:
+            base_word_pos_tags[base_word] = _get_pos_tag(base_word)
+        left_phonemes, right_phonemes = _get_phonemes_signatures(item["phonemes"])
+        words.append(word)
+        roots.append(item["roots"])
+        pos_tags.append(base_word_pos_tags[base_word])
+        lefts.append(left_phonemes)
+        rights.append(right_phonemes)
+    return len(block), (words, roots, pos_tags, lefts, rights)
 
-def _get_phonemes_signatures(phonemes: List[str]) -> Tuple[List[str], List[str]]:
+
+def _init_training_worker(allowed_words: Optional[Set[str]]) -> None:
+    global _training_allowed_words
+    _training_allowed_words = allowed_words
+
+
+def _parse_training_block_in_worker(block: bytes) -> Tuple[int, _TrainingColumns]:
+    return _parse_training_block(block, _training_allowed_words)
+
+
+class _SchemeSearchBudgetError(Exception):
+    pass
+
+
+class _SchemeSearch:
+    """Backtracking search of rhyming words for the letters of a scheme.
+
+    Rhymes are looked up once per signature bucket, i.e. per pair of tree
+    nodes, and are reused by every seed of the search. `n_seeds` bounds the
+    seeds sampled for all letters together.
+    """
+
+    def __init__(
+        self,
+        rhymer: Rhymer,
+        n_seeds: int,
+        max_n_steps: int,
+        rng: Optional[random.Random] = None,
+    ) -> None:
+        self._rhymer = rhymer
+        self._rng = rng
+        self._vocabulary = rhymer._vocabulary
+        self._n_seeds_left = n_seeds
+        self._n_steps_left = max_n_steps
+        self._bucket_rhyme_levels: Dict[
+            Tuple[int, int], Tuple[np.ndarray, np.ndarray]
+        ] = {}
+
+    def search(self, scheme: Sequence[str]) -> Optional[Dict[str, List[int]]]:
+        """Returns a chain of word ids for every letter, or None if not found.
+
+        Raises `_SchemeSearchBudgetError` if `max_n_steps` words are tried.
+        """
+        group_sizes: Dict[str, int] = {}
+        for code in scheme:
+            group_sizes[code] = group_sizes.get(code, 0) + 1
+        if not group_sizes:
+            return {}
+        if not len(self._vocabulary):
+            return None
+
+        chains: Dict[str, List[int]] = {}
+        found = self._search_groups(list(group_sizes.items()), set(), chains)
+        return chains if found else None
+
+    def _search_groups(
+        self,
+        groups: Sequence[Tuple[str, int]],
+        used_root_ids: Set[int],
+        chains: Dict[str, List[int]],
+    ) -> bool:
+        if not groups:
+            return True
+
+        code, size = groups[0]
+        while self._n_seeds_left > 0:
+            self._n_seeds_left -= 1
+            self._step()
+            seed_id = self._rhymer._sample_seed_id(size, rng=self._rng)
+            if seed_id is None:
+                return False
+            seed_root_ids = self._get_root_ids(seed_id)
+            if seed_root_ids & used_root_ids:
+                continue
+            chain = self._find_chain(seed_id, size, used_root_ids | seed_root_ids)
+            if chain is None:
+                continue
+            chain_root_ids = used_root_ids.union(
+                *(self._get_root_ids(word_id) for word_id in chain)
+            )
+            if self._search_groups(groups[1:], chain_root_ids, chains):
+                chains[code] = chain
+                return True
+        return False
+
+    def _find_chain(
+        self, seed_id: int, size: int, used_root_ids: Set[int]
+    ) -> Optional[List[int]]:
+        if size == 1:
+            return [seed_id]
+
+        # All words of a letter rhyme with its seed, so a chain costs a single
+        # rhymes lookup. The strictest level with enough rhymes is tried first.
+        rhyme_ids, levels = self._get_rhyme_levels(seed_id)
+        mask = ~self._vocabulary.has_any_root(
+            rhyme_ids,
+            np.fromiter(used_root_ids, dtype=np.int32, count=len(used_root_ids)),
+        )
+        rhyme_ids, levels = rhyme_ids[mask], levels[mask]
+        for level in range(len(self._rhymer._DEFAULT_PARAMS)):
+            level_rhyme_ids = _select_level(rhyme_ids, levels, 1 << level)
+            if len(level_rhyme_ids) < size - 1:
+                continue
+            chain = self._extend_chain(
+                [seed_id],
+                size,
+                level_rhyme_ids.tolist(),
+                self._vocabulary.pos_ids[level_rhyme_ids].tolist(),
+                0,
+                used_root_ids,
+            )
+            if chain is not None:
+                return chain
+        return None
+
+    def _extend_chain(
+        self,
+        chain: List[int],
+        size: int,
+        rhyme_ids: List[int],
+        pos_ids: List[int],
+        start: int,
+        used_root_ids: Set[int],
+    ) -> Optional[List[int]]:
+        if len(chain) == size:
+            return chain
+
+        # Neighbour words of a chain are different parts of speech.
+        prev_pos_id = int(self._vocabulary.pos_ids[chain[-1]])
+        for i in range(start, len(rhyme_ids) - (size - len(chain)) + 1):
+            self._step()
+            rhyme_root_ids = self._get_root_ids(rhyme_ids[i])
+            if pos_ids[i] == prev_pos_id or rhyme_root_ids & used_root_ids:
+                continue
+            extended_chain = self._extend_chain(
+                chain + [rhyme_ids[i]],
+                size,
+                rhyme_ids,
+                pos_ids,
+                i + 1,
+                used_root_ids | rhyme_root_ids,
+            )
+            if extended_chain is not None:
+                return extended_chain
+        return None
+
+    def _get_rhyme_levels(self, word_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        bucket = (
+            int(self._rhymer._left_nodes[word_id]),
+            int(self._rhymer._right_nodes[word_id]),
+        )
+        if bucket not in self._bucket_rhyme_levels:
+            self._bucket_rhyme_levels[bucket] = self._rhymer._get_word_id_rhyme_levels(
+                word_id
+            )
+        return self._bucket_rhyme_levels[bucket]
+
+    def _get_root_ids(self, word_id: int) -> Set[int]:
+        return set(self._vocabulary.get_root_ids(word_id).tolist())
+
+    def _step(self) -> None:
+        self._n_steps_left -= 1
+        if self._n_steps_left < 0:
+            raise _SchemeSearchBudgetError
+
+
+_index_rhymer: Optional[Rhymer] = None
+
+
+def _init_index_worker(rhymer: Rhymer) -> None:
+    global _index_rhymer
+    _index_rhymer = rhymer
+
+
+def _call_index_worker(
+    method: Callable[[Rhymer, np.ndarray], Any], word_ids: np.ndarray
+) -> Any:
+    assert _index_rhymer is not None
+    return method(_index_rhymer, word_ids)
+
+
+def _get_morph() -> "MorphAnalyzer":
+    global _morph
+    if _morph is None:
+        from pymorphy3 import MorphAnalyzer
+
+        _morph = MorphAnalyzer()
+    return _morph
+
+
+def _get_g2p() -> "Grapheme2Phoneme":
+    global _g2p
+    if _g2p is None:
+        from russian_g2p.Grapheme2Phoneme import Grapheme2Phoneme
+
+        _g2p = Grapheme2Phoneme()
+    return _g2p
+
+
+def _word_to_phonemes(word: str) -> List[str]:
+    with _g2p_lock:
+        return _get_g2p().word_to_phonemes(word)
+
+
+def _get_pos_tag(word: str) -> Optional[str]:
+    with _morph_lock:
+        pos_tag = _get_morph().parse(word)[0].tag.POS
+    # Grammemes are `str` subclasses which can't be pickled.
+    return str(pos_tag) if pos_tag is not None else None
+
+
+def _select_level(
+    rhyme_ids: np.ndarray, levels: np.ndarray, level_bit: int
+) -> np.ndarray:
+    return rhyme_ids[(levels & level_bit) != 0]
+
+
+def _get_strictest_levels(levels: np.ndarray, n_levels: int) -> np.ndarray:
+    strictest_levels = np.full(len(levels), n_levels, dtype=np.int64)
+    for level in reversed(range(n_levels)):
+        strictest_levels[(levels & (1 << level)) != 0] = level
+    return strictest_levels
+
+
+def _get_phonemes_signatures(
+    phonemes: Sequence[str],
+) -> Tuple[Sequence[str], Sequence[str]]:
     stress_idx: Optional[int] = None
     for stress_idx, phoneme in enumerate(phonemes):
         if phoneme in _STRESS_PHONEMES:
@@ -227,3 +1371,9 @@ def _get_phonemes_signatures(phonemes: List[str]) -> Tuple[List[str], List[str]]
     left = phonemes[: stress_idx + 1][::-1]
     right = phonemes[stress_idx:]
     return left, right
+
+
+def _join_phonemes_signatures(
+    left_phonemes: Sequence[str], right_phonemes: Sequence[str]
+) -> List[str]:
+    return list(left_phonemes[::-1]) + list(right_phonemes[1:])
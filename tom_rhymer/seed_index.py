@@ -0,0 +1,94 @@
+import random
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Counts are saturated, a seed never needs more rhymes than a scheme has lines.
+_MAX_COUNT: int = np.iinfo(np.uint16).max
+
+
+class SeedIndex:
+    """Numbers of rhymes of every vocabulary word, for sampling scheme seeds.
+
+    `counts[word_id, level]` is the number of rhymes found for the word with
+    `_DEFAULT_PARAMS[level]`, the word itself included. A sampling table
+    holds word ids sorted by their counts on a level, or by the maximum over
+    levels, so a random word with at least `n` rhymes is found with a single
+    binary search. Tables are built on the first use, so loading the index
+    costs nothing, and every process sorts only the tables it samples from.
+    """
+
+    def __init__(self, params: np.ndarray, counts: np.ndarray) -> None:
+        self.params = params
+        self.counts = counts
+        self._tables: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+
+    @classmethod
+    def from_counts(
+        cls,
+        params: Sequence[Tuple[Tuple[int, int], Tuple[int, int]]],
+        counts: np.ndarray,
+    ) -> "SeedIndex":
+        return cls(
+            params=np.array(params, dtype=np.int32).reshape(len(params), 4),
+            counts=np.minimum(counts, _MAX_COUNT).astype(np.uint16),
+        )
+
+    def has_params(
+        self, params: Sequence[Tuple[Tuple[int, int], Tuple[int, int]]]
+    ) -> bool:
+        return np.array_equal(
+            self.params, np.array(params, dtype=np.int32).reshape(len(params), 4)
+        )
+
+    def get_n_seeds(self, n_rhymes: int, level: Optional[int] = None) -> int:
+        """Returns the number of words with at least `n_rhymes` rhymes.
+
+        Rhymes are counted on the `level`, or on the level where the word has
+        the most of them if it's None.
+        """
+        _, sorted_counts = self._get_table(level)
+        # A scalar of the array type, otherwise the whole array is cast.
+        start = np.searchsorted(
+            sorted_counts, np.uint16(min(n_rhymes, _MAX_COUNT)), side="left"
+        )
+        return len(sorted_counts) - int(start)
+
+    def sample(
+        self,
+        n_rhymes: int,
+        level: Optional[int] = None,
+        rng: Optional[random.Random] = None,
+    ) -> Optional[int]:
+        """Returns a random word id with at least `n_rhymes` rhymes, or None."""
+        n_seeds = self.get_n_seeds(n_rhymes, level)
+        if not n_seeds:
+            return None
+        order, _ = self._get_table(level)
+        i_seed = (rng or random).randrange(n_seeds)
+        return int(order[len(order) - n_seeds + i_seed])
+
+    def _get_table(self, level: Optional[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns word ids sorted by their counts on the level, and the counts."""
+        key = -1 if level is None else level
+        table = self._tables.get(key)
+        if table is None:
+            if level is None:
+                table_counts = self.counts.max(axis=1, initial=0)
+            else:
+                table_counts = np.ascontiguousarray(self.counts[:, level])
+            order = np.argsort(table_counts, kind="stable").astype(np.int32)
+            # Concurrent builds of a table give the same result.
+            table = self._tables[key] = (order, table_counts[order])
+        return table
+
+    def to_arrays(self, prefix: str) -> Dict[str, np.ndarray]:
+        return {f"{prefix}.params": self.params, f"{prefix}.counts": self.counts}
+
+    @classmethod
+    def from_arrays(
+        cls, arrays: Dict[str, np.ndarray], prefix: str
+    ) -> Optional["SeedIndex"]:
+        if f"{prefix}.counts" not in arrays:
+            return None
+        return cls(params=arrays[f"{prefix}.params"], counts=arrays[f"{prefix}.counts"])
@@ -1,17 +1,18 @@
-from dataclasses import dataclass
-from copy import deepcopy
+import numpy as np
 
+# Tag of the virtual root node of a `FrozenTree` and of path elements which are
+# absent in the tree. Tags of a `FrozenTree` are non-negative.
+NO_TAG = -1
 
-@dataclass
-class IterStats:
-    n_matches_todo: int
-    n_skips_allowed: int
 
-    def __post_init__(self):
-        pass
-
-    def clone(self):
-        return deepcopy(self)
+def pad_paths(paths):
+    """Stacks the paths into rows of an int16 array, padded with `NO_TAG`."""
+    lengths = np.fromiter(map(len, paths), dtype=np.int64, count=len(paths))
+    padded = np.full((len(paths), lengths.max(initial=0)), NO_TAG, dtype=np.int16)
+    padded[np.arange(padded.shape[1]) < lengths[:, None]] = np.fromiter(
+        (tag for path in paths for tag in path), dtype=np.int16, count=lengths.sum()
+    )
+    return padded
 
 
 class Node:
@@ -25,29 +26,11 @@ class Node:
     def set_value(self, value):
         self._values.append(value)
 
-    def iterate_on_nodes(self, path, iter_stats: IterStats):
-        iter_stats = iter_stats.clone()
-
-        if iter_stats.n_matches_todo <= 0:
-            yield from self._values
-            for child in self._children.values():
-                yield from child.iterate_on_nodes(path[1:], iter_stats)
-
-        if not path:
-            return
-
-        # Iterate on all but matched node:
-        if iter_stats.n_skips_allowed > 0:
-            for tag, node in self._children.items():
-                if tag != path[0]:
-                    iter_stats.n_skips_allowed -= 1
-                    yield from node.iterate_on_nodes(path[1:], iter_stats)
-
-        # Iterate on valid matches:
-        node = self._children.get(path[0])
-        if node:
-            iter_stats.n_matches_todo -= 1
-            yield from node.iterate_on_nodes(path[1:], iter_stats)
+    def iterate_on_items(self, path):
+        for value in self._values:
+            yield path, value
+        for tag, child in self._children.items():
+            yield from child.iterate_on_items(path + (tag,))
 
 
 class Tree:
@@ -61,19 +44,348 @@ class Tree:
             node = node.add(tag)
         node.set_value(value)
 
-    def iterate_on_nodes(
+    def iterate_on_items(self):
+        for root_tag, node in self._roots.items():
+            yield from node.iterate_on_items((root_tag,))
+
+    def freeze(self):
+        """Compiles the tree into a `FrozenTree`. Tags and values must be integers."""
+        tags, parents, ends, children, child_offsets, values, value_offsets = (
+            [NO_TAG], [-1], [0], [], [0], [], [0, 0]
+        )
+        # Nodes are numbered in preorder, so every subtree is a contiguous range
+        # of nodes and of values. Children lists are filled in a second pass.
+        node_children = [[]]
+        stack = [(0, iter(self._roots.items()))]
+        while stack:
+            parent, items = stack[-1]
+            item = next(items, None)
+            if item is None:
+                stack.pop()
+                ends[parent] = len(tags)
+                continue
+            tag, node = item
+            idx = len(tags)
+            tags.append(tag)
+            parents.append(parent)
+            ends.append(0)
+            node_children.append([])
+            node_children[parent].append(idx)
+            values.extend(node._values)
+            value_offsets.append(len(values))
+            stack.append((idx, iter(node._children.items())))
+        ends[0] = len(tags)
+
+        for node_idx_children in node_children:
+            children.extend(node_idx_children)
+            child_offsets.append(len(children))
+
+        return FrozenTree(
+            tags=np.array(tags, dtype=np.int16),
+            parents=np.array(parents, dtype=np.int32),
+            ends=np.array(ends, dtype=np.int32),
+            children=np.array(children, dtype=np.int32),
+            child_offsets=np.array(child_offsets, dtype=np.int32),
+            values=np.array(values, dtype=np.int32),
+            value_offsets=np.array(value_offsets, dtype=np.int32),
+        )
+
+
+class FrozenTree:
+    """Read-only, array-backed version of `Tree`.
+
+    Node 0 is a virtual root whose children are the roots of the `Tree`. For the
+    node `i`:
+        - `tags[i]` is the integer code of the edge leading to it;
+        - `parents[i]` is the parent node;
+        - `children[child_offsets[i]:child_offsets[i + 1]]` are its children;
+        - `values[value_offsets[i]:value_offsets[i + 1]]` are its own values;
+        - `ends[i]` is the end of its subtree: nodes `i..ends[i] - 1` are the
+          subtree, and `values[value_offsets[i]:value_offsets[ends[i]]]` are all
+          values stored in it.
+    """
+
+    _ARRAY_NAMES = (
+        "tags",
+        "parents",
+        "ends",
+        "children",
+        "child_offsets",
+        "values",
+        "value_offsets",
+    )
+
+    def __init__(
             self,
-            path,
-            min_n_matches,
-            max_n_skips,
+            tags,
+            parents,
+            ends,
+            children,
+            child_offsets,
+            values,
+            value_offsets,
     ):
-        min_n_matches = min(len(path), min_n_matches)
-        root_tag = path[0]
-        node = self._roots.get(root_tag)
-        if not node:
+        self.tags = tags
+        self.parents = parents
+        self.ends = ends
+        self.children = children
+        self.child_offsets = child_offsets
+        self.values = values
+        self.value_offsets = value_offsets
+
+    def to_arrays(self, prefix):
+        return {f"{prefix}.{name}": getattr(self, name) for name in self._ARRAY_NAMES}
+
+    @classmethod
+    def from_arrays(cls, arrays, prefix):
+        return cls(**{name: arrays[f"{prefix}.{name}"] for name in cls._ARRAY_NAMES})
+
+    @classmethod
+    def from_paths(cls, paths):
+        """Builds the tree of `Tree.add(paths[i], i)` for every row, then `freeze`.
+
+        `paths` rows are padded with `NO_TAG`, see `pad_paths`. A node is a
+        path prefix, and children follow in the order of their first values,
+        as `Tree` inserts them. Nodes are grouped depth by depth with NumPy.
+        """
+        n_values = len(paths)
+        # Per depth: parent ids at the previous depth, tags and first values.
+        depth_parents, depth_tags, depth_firsts = [], [], []
+        value_ids = np.arange(n_values)
+        prefix_ids = np.zeros(n_values, dtype=np.int64)
+        value_depths = np.zeros(n_values, dtype=np.int64)
+        for depth in range(paths.shape[1]):
+            mask = paths[value_ids, depth] != NO_TAG
+            value_ids = value_ids[mask]
+            if not len(value_ids):
+                break
+            tags = paths[value_ids, depth].astype(np.int64)
+            keys = (prefix_ids[value_ids] << 16) | tags
+            keys, first_idx, prefix_ids[value_ids] = np.unique(
+                keys, return_index=True, return_inverse=True
+            )
+            value_depths[value_ids] = depth
+            depth_parents.append(keys >> 16)
+            depth_tags.append(keys & 0xFFFF)
+            depth_firsts.append(value_ids[first_idx])
+
+        # Subtree sizes bottom up, then preorder positions top down: a child
+        # follows its parent and the subtrees of its earlier siblings.
+        sizes = [np.ones(len(tags), dtype=np.int64) for tags in depth_tags]
+        for depth in range(len(sizes) - 1, 0, -1):
+            sizes[depth - 1] += np.bincount(
+                    depth_parents[depth], weights=sizes[depth],
+                    minlength=len(sizes[depth - 1])).astype(np.int64)
+        positions = []
+        parent_positions = np.zeros(1, dtype=np.int64)
+        for parents, firsts, depth_sizes in zip(depth_parents, depth_firsts, sizes):
+            order = np.lexsort((firsts, parents))
+            sorted_parents, sorted_sizes = parents[order], depth_sizes[order]
+            preceding = np.cumsum(sorted_sizes) - sorted_sizes
+            is_group_start = np.diff(sorted_parents, prepend=-1) != 0
+            group_ids = np.cumsum(is_group_start) - 1
+            preceding -= preceding[is_group_start][group_ids]
+            depth_positions = np.empty(len(parents), dtype=np.int64)
+            depth_positions[order] = parent_positions[sorted_parents] + 1 + preceding
+            positions.append(depth_positions)
+            parent_positions = depth_positions
+
+        n_nodes = 1 + sum(len(tags) for tags in depth_tags)
+        tags = np.full(n_nodes, NO_TAG, dtype=np.int16)
+        parents = np.full(n_nodes, -1, dtype=np.int32)
+        ends = np.full(n_nodes, n_nodes, dtype=np.int32)
+        parent_positions = np.zeros(1, dtype=np.int64)
+        for depth in range(len(positions)):
+            tags[positions[depth]] = depth_tags[depth]
+            parents[positions[depth]] = parent_positions[depth_parents[depth]]
+            ends[positions[depth]] = positions[depth] + sizes[depth]
+            parent_positions = positions[depth]
+
+        # Children of a node are in preorder, so sorting by parents keeps them.
+        children = np.argsort(parents[1:], kind="stable").astype(np.int32) + 1
+        child_offsets = np.zeros(n_nodes + 1, dtype=np.int32)
+        child_offsets[1:] = np.cumsum(np.bincount(parents[1:], minlength=n_nodes))
+
+        value_nodes = np.zeros(n_values, dtype=np.int64)
+        for depth, depth_positions in enumerate(positions):
+            mask = value_depths == depth
+            value_nodes[mask] = depth_positions[prefix_ids[mask]]
+        value_offsets = np.zeros(n_nodes + 1, dtype=np.int32)
+        value_offsets[1:] = np.cumsum(np.bincount(value_nodes, minlength=n_nodes))
+        return cls(
+            tags=tags,
+            parents=parents,
+            ends=ends,
+            children=children,
+            child_offsets=child_offsets,
+            values=np.argsort(value_nodes, kind="stable").astype(np.int32),
+            value_offsets=value_offsets,
+        )
+
+    @property
+    def n_nodes(self):
+        return len(self.tags)
+
+    def get_path(self, node):
+        parents = memoryview(self.parents)
+        tags = memoryview(self.tags)
+        path = []
+        while node > 0:
+            path.append(tags[node])
+            node = parents[node]
+        return tuple(reversed(path))
+
+    def get_paths(self, nodes):
+        """Returns `get_path` of every node as rows padded with `NO_TAG`."""
+        # Tags from the nodes up, then every row is reversed within its length.
+        columns = []
+        nodes = np.asarray(nodes, dtype=np.int64)
+        while True:
+            mask = nodes > 0
+            if not mask.any():
+                break
+            columns.append(np.where(mask, self.tags[nodes], NO_TAG))
+            nodes = np.where(mask, self.parents[nodes], 0)
+        paths = np.full((len(nodes), len(columns)), NO_TAG, dtype=np.int16)
+        if columns:
+            lengths = (np.stack(columns, axis=1) != NO_TAG).sum(axis=1)
+            for i, column in enumerate(columns):
+                rows = np.flatnonzero(lengths > i)
+                paths[rows, lengths[rows] - 1 - i] = column[rows]
+        return paths
+
+    def get_value_nodes(self, n_values):
+        """Returns an array which maps every value to the node it's stored in."""
+        value_nodes = np.full(n_values, -1, dtype=np.int32)
+        counts = np.diff(self.value_offsets)
+        node_ids = np.arange(self.n_nodes, dtype=np.int32)
+        value_nodes[self.values] = np.repeat(node_ids, counts)
+        return value_nodes
+
+    def iterate_on_subtrees(self, path, min_n_matches, max_n_skips):
+        """Yields nodes whose whole subtrees match the path.
+
+        The first tag must match. Other tags can be skipped while skips are
+        allowed, and every skipped sibling consumes one more skip. Once
+        `min_n_matches` tags are matched, the whole subtree matches. Every
+        subtree is yielded once, and yielded subtrees don't overlap.
+        """
+        levels = [(min_n_matches, max_n_skips)]
+        for node, _ in self.iterate_on_level_subtrees(path, levels):
+            yield node
+
+    def iterate_on_level_subtrees(self, path, levels):
+        """Matches the path with several `(min_n_matches, max_n_skips)` levels at once.
+
+        Yields `(node, level_idx)` pairs, the same as `iterate_on_subtrees`
+        yields for every level, but the tree is walked only once: a node carries
+        the states of all levels which reach it.
+        """
+        if not path:
             return
-        iter_stats = IterStats(
-            n_matches_todo=min_n_matches - 1,
-            n_skips_allowed=max_n_skips,
+        tags = memoryview(self.tags)
+        children = memoryview(self.children)
+        child_offsets = memoryview(self.child_offsets)
+
+        root = self._find_child(0, path[0], tags, children, child_offsets)
+        if root is None:
+            return
+
+        states = tuple(
+            (level_idx, min(len(path), min_n_matches) - 1, max_n_skips)
+            for level_idx, (min_n_matches, max_n_skips) in enumerate(levels)
+        )
+        stack = [(root, 1, states)]
+        while stack:
+            node, depth, states = stack.pop()
+            active_states = []
+            for state in states:
+                if state[1] <= 0:
+                    yield node, state[0]
+                else:
+                    active_states.append(state)
+            if not active_states or depth == len(path):
+                continue
+
+            tag = path[depth]
+            match = None
+            n_skipped = 0
+            for i in range(child_offsets[node], child_offsets[node + 1]):
+                child = children[i]
+                if tags[child] == tag:
+                    match = child
+                    continue
+                # Each skipped sibling consumes one more skip.
+                n_skipped += 1
+                child_states = tuple(
+                    (level_idx, n_matches_todo, n_skips_allowed - n_skipped)
+                    for level_idx, n_matches_todo, n_skips_allowed in active_states
+                    if n_skips_allowed > 0
+                )
+                if child_states:
+                    stack.append((child, depth + 1, child_states))
+            if match is not None:
+                child_states = tuple(
+                    (
+                        level_idx,
+                        n_matches_todo - 1,
+                        (
+                            n_skips_allowed - n_skipped
+                            if n_skips_allowed > 0
+                            else n_skips_allowed
+                        ),
+                    )
+                    for level_idx, n_matches_todo, n_skips_allowed in active_states
+                )
+                stack.append((match, depth + 1, child_states))
+
+    def get_subtrees(self, path, min_n_matches, max_n_skips):
+        """Returns matched subtrees as `(starts, ends)` node arrays sorted by start."""
+        return self.get_level_subtrees(path, [(min_n_matches, max_n_skips)])[0]
+
+    def get_level_subtrees(self, path, levels):
+        """Returns `get_subtrees` results for every level, walking the tree once."""
+        level_nodes = [[] for _ in levels]
+        for node, level_idx in self.iterate_on_level_subtrees(path, levels):
+            level_nodes[level_idx].append(node)
+        subtrees = []
+        for nodes in level_nodes:
+            starts = np.array(sorted(nodes), dtype=np.int32)
+            subtrees.append((starts, self.ends[starts]))
+        return subtrees
+
+    def count_values(self, starts, ends):
+        return int((self.value_offsets[ends] - self.value_offsets[starts]).sum())
+
+    def get_values(self, starts, ends):
+        value_offsets = self.value_offsets
+        return np.concatenate(
+            [self.values[0:0]]
+            + [
+                self.values[value_offsets[start]:value_offsets[end]]
+                for start, end in zip(starts.tolist(), ends.tolist())
+            ]
         )
-        yield from node.iterate_on_nodes(path[1:], iter_stats)
+
+    @staticmethod
+    def in_subtrees(nodes, starts, ends):
+        """Checks which of the nodes lie in the subtrees returned by `get_subtrees`."""
+        if not len(starts):
+            return np.zeros(len(nodes), dtype=bool)
+        idx = np.searchsorted(starts, nodes, side="right") - 1
+        return (idx >= 0) & (nodes < ends[np.maximum(idx, 0)])
+
+    def iterate_on_nodes(self, path, min_n_matches, max_n_skips):
+        values = self.values
+        value_offsets = memoryview(self.value_offsets)
+        ends = memoryview(self.ends)
+        for node in self.iterate_on_subtrees(path, min_n_matches, max_n_skips):
+            yield from values[value_offsets[node]:value_offsets[ends[node]]].tolist()
+
+    @staticmethod
+    def _find_child(node, tag, tags, children, child_offsets):
+        for i in range(child_offsets[node], child_offsets[node + 1]):
+            child = children[i]
+            if tags[child] == tag:
+                return child
+        return None
@@ -0,0 +1,346 @@
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+
+import numpy as np
+
+
+def _get_positions(
+    starts: np.ndarray, counts: np.ndarray, offsets: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """Returns positions of the `starts[i]:starts[i] + counts[i]` runs, run after run.
+
+    `offsets` are the cumulative counts starting with 0, if they are at hand.
+    """
+    if offsets is None:
+        offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+    return np.arange(offsets[-1]) + np.repeat(starts - offsets[:-1], counts)
+
+
+class StringTable:
+    """Immutable list of strings stored as one utf-8 blob and offsets into it."""
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray) -> None:
+        self.blob = blob
+        self.offsets = offsets
+
+    @classmethod
+    def from_strings(cls, strings: Iterable[str]) -> "StringTable":
+        return cls.from_bytes([string.encode() for string in strings])
+
+    @classmethod
+    def from_bytes(cls, encoded: Sequence[bytes]) -> "StringTable":
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(string) for string in encoded])
+        blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        return cls(blob=blob, offsets=offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, idx: int) -> str:
+        return self.get_bytes(idx).decode()
+
+    def get_bytes(self, idx: int) -> bytes:
+        return self.blob[self.offsets[idx] : self.offsets[idx + 1]].tobytes()
+
+    def select(self, ids: np.ndarray) -> "StringTable":
+        """Returns the table of the strings `ids`, in their order."""
+        starts = self.offsets[ids]
+        lengths = self.offsets[ids + 1] - starts
+        offsets = np.zeros(len(ids) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        return StringTable(
+            blob=self.blob[_get_positions(starts, lengths, offsets)],
+            offsets=offsets,
+        )
+
+    def concat(self, other: "StringTable") -> "StringTable":
+        return StringTable(
+            blob=np.concatenate([self.blob, other.blob]),
+            offsets=np.concatenate([self.offsets, other.offsets[1:] + len(self.blob)]),
+        )
+
+    def to_arrays(self, prefix: str) -> Dict[str, np.ndarray]:
+        return {f"{prefix}.blob": self.blob, f"{prefix}.offsets": self.offsets}
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], prefix: str) -> "StringTable":
+        return cls(blob=arrays[f"{prefix}.blob"], offsets=arrays[f"{prefix}.offsets"])
+
+
+class Vocabulary:
+    """Columnar storage of the stressed words and their roots.
+
+    Roots are interned: `root_ids[root_offsets[i]:root_offsets[i + 1]]` are the
+    ids of the word `i` roots in the `roots` table. `pos_ids[i]` is the id of the
+    word `i` part of speech in the `pos_tags` table, where the empty tag stands
+    for an unknown one. `sorted_ids` orders words by their utf-8 bytes and is
+    used for lookups.
+    """
+
+    def __init__(
+        self,
+        words: StringTable,
+        roots: StringTable,
+        root_ids: np.ndarray,
+        root_offsets: np.ndarray,
+        pos_tags: StringTable,
+        pos_ids: np.ndarray,
+        sorted_ids: np.ndarray,
+    ) -> None:
+        self.words = words
+        self.roots = roots
+        self.root_ids = root_ids
+        self.root_offsets = root_offsets
+        self.pos_tags = pos_tags
+        self.pos_ids = pos_ids
+        self.sorted_ids = sorted_ids
+        self._pos_tag_to_id = {pos_tags[i]: i for i in range(len(pos_tags))}
+        self._root_to_id: Optional[Dict[str, int]] = None
+
+    @classmethod
+    def from_words(
+        cls,
+        words: Sequence[str],
+        roots: Sequence[Iterable[str]],
+        pos_tags: Sequence[Optional[str]],
+    ) -> "Vocabulary":
+        builder = VocabularyBuilder()
+        for word, word_roots, pos_tag in zip(words, roots, pos_tags):
+            builder.add(word, word_roots, pos_tag)
+        return builder.build()
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def get_word(self, word_id: int) -> str:
+        return self.words[word_id]
+
+    def get_roots(self, word_id: int) -> Set[str]:
+        start, end = self.root_offsets[word_id], self.root_offsets[word_id + 1]
+        return {self.roots[root_id] for root_id in self.root_ids[start:end].tolist()}
+
+    def get_root_ids(self, word_id: int) -> np.ndarray:
+        return self.root_ids[
+            self.root_offsets[word_id] : self.root_offsets[word_id + 1]
+        ]
+
+    def find_root_ids(self, roots: Iterable[str]) -> List[int]:
+        """Returns ids of the known roots. Unknown ones are skipped."""
+        if self._root_to_id is None:
+            self._root_to_id = {self.roots[i]: i for i in range(len(self.roots))}
+        return [self._root_to_id[root] for root in roots if root in self._root_to_id]
+
+    def has_any_root(self, word_ids: np.ndarray, root_ids: np.ndarray) -> np.ndarray:
+        """Checks which of the words have at least one of the roots."""
+        root_mask = np.zeros(len(self.roots), dtype=bool)
+        root_mask[root_ids] = True
+
+        starts = self.root_offsets[word_ids]
+        counts = self.root_offsets[word_ids + 1] - starts
+        # Positions of all words roots in `self.root_ids`, word after word.
+        positions = _get_positions(starts, counts)
+        owners = np.repeat(np.arange(len(word_ids)), counts)
+
+        has_root = np.zeros(len(word_ids), dtype=bool)
+        has_root[owners[root_mask[self.root_ids[positions]]]] = True
+        return has_root
+
+    def get_pos(self, word_id: int) -> Optional[str]:
+        return self.pos_tags[self.pos_ids[word_id]] or None
+
+    def get_pos_id(self, pos_tag: Optional[str]) -> int:
+        """Returns the id of the part of speech tag, or -1 if no word has it."""
+        return self._pos_tag_to_id.get(pos_tag or "", -1)
+
+    def find(self, word: str) -> Optional[int]:
+        key = word.encode()
+        sorted_ids = self.sorted_ids
+        idx = bisect_left(
+            range(len(sorted_ids)),
+            key,
+            key=lambda i: self.words.get_bytes(sorted_ids[i]),
+        )
+        if idx < len(sorted_ids) and self.words.get_bytes(sorted_ids[idx]) == key:
+            return int(sorted_ids[idx])
+        return None
+
+    def select(self, word_ids: np.ndarray) -> "Vocabulary":
+        """Returns the vocabulary of the words `word_ids`, in their order.
+
+        Roots no selected word has are dropped, POS tags are kept.
+        """
+        starts = self.root_offsets[word_ids]
+        counts = self.root_offsets[word_ids + 1] - starts
+        root_offsets = np.zeros(len(word_ids) + 1, dtype=np.int64)
+        np.cumsum(counts, out=root_offsets[1:])
+        root_ids = self.root_ids[_get_positions(starts, counts, root_offsets)]
+        # Renumbering keeps the order of the roots, so word roots stay sorted.
+        kept_root_ids, root_ids = np.unique(root_ids, return_inverse=True)
+
+        new_ids = np.full(len(self), -1, dtype=np.int32)
+        new_ids[word_ids] = np.arange(len(word_ids), dtype=np.int32)
+        sorted_ids = new_ids[self.sorted_ids]
+        return Vocabulary(
+            words=self.words.select(word_ids),
+            roots=self.roots.select(kept_root_ids),
+            root_ids=root_ids.astype(np.int32),
+            root_offsets=root_offsets,
+            pos_tags=self.pos_tags,
+            pos_ids=self.pos_ids[word_ids],
+            sorted_ids=sorted_ids[sorted_ids >= 0],
+        )
+
+    def concat(self, other: "Vocabulary") -> "Vocabulary":
+        """Returns the vocabulary of the words of `self`, then of `other`."""
+        if self._root_to_id is None:
+            self._root_to_id = {self.roots[i]: i for i in range(len(self.roots))}
+        root_to_id = dict(self._root_to_id)
+        other_roots = [other.roots[i] for i in range(len(other.roots))]
+        root_map = np.array(
+            [root_to_id.setdefault(root, len(root_to_id)) for root in other_roots],
+            dtype=np.int32,
+        )
+        pos_tag_to_id = dict(self._pos_tag_to_id)
+        pos_map = np.array(
+            [
+                pos_tag_to_id.setdefault(other.pos_tags[i], len(pos_tag_to_id))
+                for i in range(len(other.pos_tags))
+            ],
+            dtype=np.uint8,
+        )
+
+        # Mapped roots may come in another order, so word roots are sorted again.
+        other_root_ids = root_map[other.root_ids]
+        owners = np.repeat(np.arange(len(other)), np.diff(other.root_offsets))
+        other_root_ids = other_root_ids[np.lexsort((other_root_ids, owners))]
+
+        # Both orders are merged by looking up where other words go in self.
+        other_words = [other.words.get_bytes(i) for i in other.sorted_ids.tolist()]
+        insert_at = [
+            bisect_left(
+                range(len(self.sorted_ids)),
+                word,
+                key=lambda i: self.words.get_bytes(self.sorted_ids[i]),
+            )
+            for word in other_words
+        ]
+        sorted_ids = np.insert(
+            self.sorted_ids,
+            np.array(insert_at, dtype=np.int64),
+            other.sorted_ids + len(self),
+        )
+        return Vocabulary(
+            words=self.words.concat(other.words),
+            roots=self.roots.concat(
+                StringTable.from_strings(list(root_to_id)[len(self.roots) :])
+            ),
+            root_ids=np.concatenate([self.root_ids, other_root_ids]),
+            root_offsets=np.concatenate(
+                [self.root_offsets, other.root_offsets[1:] + self.root_offsets[-1]]
+            ),
+            pos_tags=StringTable.from_strings(pos_tag_to_id),
+            pos_ids=np.concatenate([self.pos_ids, pos_map[other.pos_ids]]),
+            sorted_ids=sorted_ids.astype(np.int32),
+        )
+
+    def find_ids(self, words: Iterable[str]) -> np.ndarray:
+        """Returns ids of all the vocabulary words equal to any of `words`."""
+        ids: List[int] = []
+        sorted_ids = self.sorted_ids
+        for word in words:
+            key = word.encode()
+            idx = bisect_left(
+                range(len(sorted_ids)),
+                key,
+                key=lambda i: self.words.get_bytes(sorted_ids[i]),
+            )
+            while (
+                idx < len(sorted_ids) and self.words.get_bytes(sorted_ids[idx]) == key
+            ):
+                ids.append(int(sorted_ids[idx]))
+                idx += 1
+        return np.array(ids, dtype=np.int64)
+
+    def to_arrays(self, prefix: str) -> Dict[str, np.ndarray]:
+        return {
+            **self.words.to_arrays(f"{prefix}.words"),
+            **self.roots.to_arrays(f"{prefix}.roots"),
+            f"{prefix}.root_ids": self.root_ids,
+            f"{prefix}.root_offsets": self.root_offsets,
+            **self.pos_tags.to_arrays(f"{prefix}.pos_tags"),
+            f"{prefix}.pos_ids": self.pos_ids,
+            f"{prefix}.sorted_ids": self.sorted_ids,
+        }
+
+    def __getstate__(self) -> Dict:
+        return {**self.__dict__, "_root_to_id": None}
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], prefix: str) -> "Vocabulary":
+        return cls(
+            words=StringTable.from_arrays(arrays, f"{prefix}.words"),
+            roots=StringTable.from_arrays(arrays, f"{prefix}.roots"),
+            root_ids=arrays[f"{prefix}.root_ids"],
+            root_offsets=arrays[f"{prefix}.root_offsets"],
+            pos_tags=StringTable.from_arrays(arrays, f"{prefix}.pos_tags"),
+            pos_ids=arrays[f"{prefix}.pos_ids"],
+            sorted_ids=arrays[f"{prefix}.sorted_ids"],
+        )
+
+
+class VocabularyBuilder:
+    """Accumulates the `Vocabulary` columns word by word.
+
+    Words are kept encoded, and roots and POS tags are interned as they come,
+    so no per-word objects are kept until `build`.
+    """
+
+    def __init__(self) -> None:
+        self._encoded_words: List[bytes] = []
+        self._root_to_id: Dict[str, int] = {}
+        self._root_ids = array("i")
+        self._root_offsets = array("q", [0])
+        self._pos_tag_to_id: Dict[str, int] = {"": 0}
+        self._pos_ids = array("B")
+
+    def __len__(self) -> int:
+        return len(self._encoded_words)
+
+    def add(self, word: str, roots: Iterable[str], pos_tag: Optional[str]) -> None:
+        self._encoded_words.append(word.encode())
+        root_to_id = self._root_to_id
+        if not isinstance(roots, (list, tuple, set)):
+            roots = list(roots)
+        if len(roots) == 1:
+            for root in roots:
+                self._root_ids.append(root_to_id.setdefault(root, len(root_to_id)))
+        else:
+            # Roots are sorted, so the ids don't depend on the set order.
+            self._root_ids.extend(
+                sorted(
+                    {
+                        root_to_id.setdefault(root, len(root_to_id))
+                        for root in sorted(roots)
+                    }
+                )
+            )
+        self._root_offsets.append(len(self._root_ids))
+        self._pos_ids.append(
+            self._pos_tag_to_id.setdefault(pos_tag or "", len(self._pos_tag_to_id))
+        )
+
+    def build(self) -> Vocabulary:
+        encoded_words = self._encoded_words
+        sorted_ids = sorted(range(len(encoded_words)), key=encoded_words.__getitem__)
+        return Vocabulary(
+            words=StringTable.from_bytes(encoded_words),
+            roots=StringTable.from_strings(self._root_to_id),
+            root_ids=np.frombuffer(self._root_ids, dtype=np.int32).copy(),
+            root_offsets=np.frombuffer(self._root_offsets, dtype=np.int64).copy(),
+            pos_tags=StringTable.from_strings(self._pos_tag_to_id),
+            pos_ids=np.frombuffer(self._pos_ids, dtype=np.uint8).copy(),
+            sorted_ids=np.array(sorted_ids, dtype=np.int32),
+        )